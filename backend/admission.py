@@ -0,0 +1,294 @@
+"""
+Admission control for LLM calls. Cohere calls run on their own bounded
+pool instead of on request threads, so a burst of chat users waits in
+(or is shed from) a short queue rather than tying up the threads that
+serve the dashboard. Every call has a deadline, and each client is rate
+limited with a token bucket.
+
+Limits are per process; with several gunicorn workers each worker gets
+its own pool and buckets.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Cohere calls allowed to run at once, and admitted calls allowed to wait
+LLM_WORKERS = int(os.getenv('LLM_WORKERS', 8))
+LLM_QUEUE_SIZE = int(os.getenv('LLM_QUEUE_SIZE', 16))
+# Each admitted sync call holds a gunicorn request thread while it waits,
+# so the sync pool admits at most WORKER_THREADS (gunicorn.conf.py) less
+# LLM_RESERVED_THREADS calls, keeping threads free for the dashboard
+WORKER_THREADS = int(os.getenv('WORKER_THREADS', 16))
+LLM_RESERVED_THREADS = int(os.getenv('LLM_RESERVED_THREADS', 6))
+# Seconds a caller waits for a slot plus the call (or its first token)
+LLM_DEADLINE = float(os.getenv('LLM_DEADLINE', 30))
+# Per-client token bucket: sustained LLM requests per minute, and burst size
+LLM_RATE_PER_MINUTE = float(os.getenv('LLM_RATE_PER_MINUTE', 20))
+LLM_BURST = int(os.getenv('LLM_BURST', 10))
+
+
+class AdmissionError(Exception):
+    """
+    An LLM request refused or abandoned by admission control. `status` is
+    the HTTP status to answer with.
+    """
+    status = 503
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitedError(AdmissionError):
+    status = 429
+
+
+class OverloadedError(AdmissionError):
+    status = 503
+
+
+class DeadlineExceededError(AdmissionError):
+    status = 504
+
+
+class RateLimiter:
+    """
+    Token bucket per client: `burst` requests at once, refilled at `rate`
+    per second. Buckets of the least recently seen clients are dropped
+    beyond `max_clients`; a dropped bucket comes back full.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def check(self, client_id):
+        """
+        Take one token for `client_id`, or raise RateLimitedError
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[client_id] = (tokens, now)
+                self.limited += 1
+                retry_after = (1 - tokens) / self.rate if self.rate else 60
+                raise RateLimitedError("Too many AI requests; please slow down", retry_after=max(1, round(retry_after)))
+
+            self._buckets[client_id] = (tokens - 1, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+
+
+class _Stats:
+    def __init__(self, workers, max_queue, deadline, max_admitted=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.max_admitted = workers + max_queue if max_admitted is None else min(max_admitted, workers + max_queue)
+        self.admitted = 0
+        self.running = 0
+        self.shed = 0
+        self.timed_out = 0
+
+    def _check_capacity(self):
+        if self.admitted >= self.max_admitted:
+            self.shed += 1
+            raise OverloadedError("The AI assistant is busy; please try again shortly")
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_admitted': self.max_admitted,
+            'running': self.running,
+            'queued': max(0, self.admitted - self.running),
+            'shed': self.shed,
+            'timed_out': self.timed_out
+        }
+
+
+_DONE = object()
+
+
+class LLMPool(_Stats):
+    """
+    Runs blocking LLM calls on `workers` dedicated threads. At most
+    `max_queue` more calls may wait for a thread, and no more than
+    `max_admitted` in all; beyond that, calls are shed at once with
+    OverloadedError. A caller waits at most `deadline` seconds, then gets
+    DeadlineExceededError; a call still queued by then is dropped without
+    running.
+    """
+
+    def __init__(self, workers=LLM_WORKERS, max_queue=LLM_QUEUE_SIZE, deadline=LLM_DEADLINE,
+                 max_admitted=max(1, WORKER_THREADS - LLM_RESERVED_THREADS)):
+        super().__init__(workers, max_queue, deadline, max_admitted)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm')
+        self._lock = threading.Lock()
+
+    def ensure_capacity(self):
+        """
+        Shed now, before a response starts, if a call would be refused
+        """
+        with self._lock:
+            self._check_capacity()
+
+    def _submit(self, fn):
+        with self._lock:
+            self._check_capacity()
+            self.admitted += 1
+        deadline = time.monotonic() + self.deadline
+
+        def run():
+            with self._lock:
+                self.running += 1
+            try:
+                if time.monotonic() >= deadline:
+                    # The caller has already given up
+                    return None
+                return fn()
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        future = self._executor.submit(run)
+        future.add_done_callback(self._release)
+        return future, deadline
+
+    def _release(self, future):
+        with self._lock:
+            self.admitted -= 1
+
+    def _timed_out(self, future):
+        future.cancel()
+        with self._lock:
+            self.timed_out += 1
+        return DeadlineExceededError("The AI assistant took too long to answer", retry_after=5)
+
+    def call(self, fn):
+        """
+        Run fn() on the pool and return its result
+        """
+        future, deadline = self._submit(fn)
+        try:
+            return future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            raise self._timed_out(future) from None
+
+    def stream(self, make_iterable):
+        """
+        Iterate make_iterable() on the pool, yielding its items here. The
+        deadline covers the wait for the first item and then each gap
+        between items. Closing this generator stops the producer.
+        """
+        items = queue.Queue()
+        closed = threading.Event()
+
+        def produce():
+            try:
+                for item in make_iterable():
+                    if closed.is_set():
+                        return
+                    items.put((item, None))
+                items.put((_DONE, None))
+            except Exception as e:
+                items.put((_DONE, e))
+
+        future, deadline = self._submit(produce)
+        try:
+            while True:
+                try:
+                    item, error = items.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    raise self._timed_out(future) from None
+                if error is not None:
+                    raise error
+                if item is _DONE:
+                    return
+                yield item
+                deadline = time.monotonic() + self.deadline
+        finally:
+            closed.set()
+
+
+class AsyncLLMGate(_Stats):
+    """
+    LLMPool's limits for coroutines on one event loop: at most `workers`
+    calls run at once, at most `max_queue` wait, and each caller gives up
+    after `deadline` seconds.
+    """
+
+    def __init__(self, workers=LLM_WORKERS, max_queue=LLM_QUEUE_SIZE, deadline=LLM_DEADLINE):
+        super().__init__(workers, max_queue, deadline)
+        self._semaphore = asyncio.Semaphore(workers)
+
+    def ensure_capacity(self):
+        self._check_capacity()
+
+    def _admit(self):
+        self._check_capacity()
+        self.admitted += 1
+        return time.monotonic() + self.deadline
+
+    def _timed_out(self):
+        self.timed_out += 1
+        return DeadlineExceededError("The AI assistant took too long to answer", retry_after=5)
+
+    async def call(self, coroutine_fn):
+        """
+        Await coroutine_fn() once a slot is free and return its result
+        """
+        deadline = self._admit()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), max(0, deadline - time.monotonic()))
+            self.running += 1
+            try:
+                return await asyncio.wait_for(coroutine_fn(), max(0, deadline - time.monotonic()))
+            finally:
+                self.running -= 1
+                self._semaphore.release()
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+        finally:
+            self.admitted -= 1
+
+    async def stream(self, make_async_iterable):
+        """
+        Iterate the async iterable from make_async_iterable() (a coroutine)
+        while holding a slot. The deadline covers the first item and then
+        each gap between items.
+        """
+        deadline = self._admit()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), max(0, deadline - time.monotonic()))
+            self.running += 1
+            try:
+                iterator = (await asyncio.wait_for(make_async_iterable(), max(0, deadline - time.monotonic()))).__aiter__()
+                while True:
+                    try:
+                        item = await asyncio.wait_for(iterator.__anext__(), max(0, deadline - time.monotonic()))
+                    except StopAsyncIteration:
+                        return
+                    yield item
+                    deadline = time.monotonic() + self.deadline
+            finally:
+                self.running -= 1
+                self._semaphore.release()
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+        finally:
+            self.admitted -= 1
+
+
+llm_pool = LLMPool()
+async_llm_gate = AsyncLLMGate()
+llm_rate_limiter = RateLimiter(LLM_RATE_PER_MINUTE / 60, LLM_BURST)
@@ -0,0 +1,130 @@
+from datetime import timedelta
+from carbon import NON_EMITTING_CATEGORIES
+from rollup import DailyRollup, percent_change
+
+# Windows the dashboard reports on
+RECENT_DAYS = 30
+OVERVIEW_DAYS = 180
+OVERVIEW_MONTHS = 6
+
+CATEGORY_COLORS = {
+    'TRANSPORTATION': '#ef4444',
+    'FOOD_AND_DRINK': '#f97316',
+    'RENT_AND_UTILITIES': '#3b82f6',
+    'GENERAL_MERCHANDISE': '#8b5cf6',
+    'GENERAL_SERVICES': '#10b981',
+    'TRAVEL': '#ec4899',
+    'HOME_IMPROVEMENT': '#14b8a6'
+}
+
+
+class Aggregates:
+    """
+    Every total the dashboard and chatbot need, read from a DailyRollup of
+    a ledger's TransactionFrame. Routes only project these into their
+    response shapes.
+    """
+
+    def __init__(self, frame, today):
+        self.rollup = rollup = DailyRollup(frame, today - timedelta(days=OVERVIEW_DAYS), today)
+
+        # The recent window and the window of the same length before it
+        recent_start = today - timedelta(days=RECENT_DAYS)
+        previous_end = recent_start - timedelta(days=1)
+        previous_start = previous_end - (today - recent_start)
+
+        self.transaction_count = int(round(rollup.total('count', recent_start, today)))
+        self.spending_by_category = rollup.by_category('spending', recent_start, today, 'expense_count')
+        self.total_spending = rollup.total('spending', recent_start, today)
+        self.total_income = rollup.total('income', recent_start, today)
+        self.carbon_by_category = rollup.by_category('expense_carbon', recent_start, today, 'expense_count')
+        self.total_carbon = rollup.total('expense_carbon', recent_start, today)
+        self.emissions_by_category = {
+            category: value
+            for category, value in rollup.by_category('carbon', recent_start, today).items()
+            if category not in NON_EMITTING_CATEGORIES
+        }
+        self.recent_carbon = rollup.total('carbon', recent_start, today)
+        self.recent_net = rollup.total('net', recent_start, today)
+        self.previous_spending = rollup.total('spending', previous_start, previous_end)
+        self.previous_carbon = rollup.total('carbon', previous_start, previous_end)
+        self.recent_transactions = process_transactions(frame.since(recent_start))
+
+        # Calendar months over the overview window, keyed by year and month
+        self.monthly = [
+            {'month': month, 'Spending': spending, 'Income': income}
+            for (month, spending), (_, income) in zip(
+                rollup.monthly('spending'), rollup.monthly('income')
+            )
+        ]
+
+    def transactions_view(self):
+        return self.recent_transactions
+
+    def carbon_footprint_view(self):
+        # Format for pie chart
+        carbon_data = []
+        for category, value in self.emissions_by_category.items():
+            carbon_data.append({
+                'name': category.replace('_', ' ').title(),
+                'value': round(value / 1000, 1),  # Convert to tons
+                'color': CATEGORY_COLORS.get(category, '#6b7280')
+            })
+        return carbon_data
+
+    def overview_view(self):
+        overview_data = []
+        for month in self.monthly[-OVERVIEW_MONTHS:]:
+            saving = max(0, month['Income'] - month['Spending'])
+            overview_data.append({
+                'name': month['month'].strftime('%b'),
+                'month': month['month'].strftime('%Y-%m'),
+                'Spending': round(month['Spending'], 2),
+                'Saving': round(saving, 2),
+                'Income': round(month['Income'], 2)
+            })
+        return overview_data
+
+    def summary_view(self, total_balance):
+        # Convert to tons
+        carbon_footprint = round(self.recent_carbon / 1000, 1)
+
+        # Compare with the previous window; the balance then was today's
+        # minus the net flow since
+        balance_change = percent_change(total_balance, total_balance - self.recent_net)
+        spending_change = percent_change(self.total_spending, self.previous_spending)
+        carbon_change = percent_change(self.recent_carbon, self.previous_carbon)
+        return {
+            "totalBalance": f"${total_balance:,.2f}",
+            "monthlySpending": f"${self.total_spending:,.2f}",
+            "carbonFootprint": f"{carbon_footprint} tons CO₂",
+            "balanceChange": f"{balance_change:+}%",
+            "spendingChange": f"{spending_change:+}%",
+            "carbonChange": f"{carbon_change:+}%"
+        }
+
+    def chat_view(self):
+        return {
+            'spending_by_category': self.spending_by_category,
+            'total_spending': self.total_spending,
+            'carbon_by_category': self.carbon_by_category,
+            'total_carbon': self.total_carbon,
+            'total_income': self.total_income,
+            'transaction_count': self.transaction_count
+        }
+
+
+def process_transactions(frame):
+    # Process transactions to match frontend format
+    processed_transactions = []
+    for transaction, code, carbon, impact in zip(frame.transactions, frame.codes, frame.carbon, frame.impacts):
+        processed_transactions.append({
+            'id': transaction.transaction_id,
+            'name': transaction.merchant_name or transaction.name,
+            'amount': f"${abs(transaction.amount):.2f}",
+            'date': transaction.date.strftime('%b %d, %Y'),
+            'category': frame.categories[code],
+            'carbon': f"{carbon} kg",
+            'impact': impact
+        })
+    return processed_transactions
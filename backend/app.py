@@ -1,7 +1,6 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import plaid
-from plaid.api import plaid_api
 from plaid.model.link_token_create_request import LinkTokenCreateRequest
 from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
 from plaid.model.link_token_account_filters import LinkTokenAccountFilters
@@ -11,40 +10,408 @@ from plaid.model.depository_account_subtype import DepositoryAccountSubtype
 from plaid.model.products import Products
 from plaid.model.country_code import CountryCode
 from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchangeRequest
-from plaid.model.transactions_get_request import TransactionsGetRequest
-from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
 from plaid.model.accounts_get_request import AccountsGetRequest
-import random
-from datetime import datetime, timedelta
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import os
 import json
 from dotenv import load_dotenv
-from chatbot import get_chat_response
-import requests
-from cohere_insights import get_recommendations, format_data, fetch_data
+from chatbot import get_chat_response, stream_chat_response
+from cohere_insights import get_cached_recommendations, fetch_data
+from cache import TTLCache
+from llm_cache import response_cache
+from clients import CIRCUIT_RESET_TIMEOUT, circuit_stats, plaid_client
+from circuit import CircuitOpenError
+from admission import AdmissionError, async_llm_gate, llm_pool, llm_rate_limiter
+from storage import default_store
+from state import default_state
+from scheduler import RefreshScheduler
+from ledger import Ledger
+from aggregates import Aggregates, OVERVIEW_DAYS, RECENT_DAYS, process_transactions
+from carbon import TransactionFrame
+from export import EXPORT_FORMATS, export_chunks
+from compression import compress_response
+from logs import configure_logging
+import metrics
 
 load_dotenv()
+configure_logging()
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 CORS(app)
 
-# Configure Plaid client
-configuration = plaid.Configuration(
-    host=plaid.Environment.Sandbox,
-    api_key={
-        'clientId': os.getenv('PLAID_CLIENT_ID'),
-        'secret': os.getenv('PLAID_SECRET'),
-    }
+# Durable storage for items, access tokens, sync cursors and transactions
+store = default_store()
+
+# Linked items and chat history, shared across workers with STATE_BACKEND=redis
+state = default_state(store)
+conversations = state.conversations
+
+# Ledgers per client and item, kept current with /transactions/sync
+ledgers = {}
+ledgers_lock = threading.Lock()
+
+# Sync freshness markers and aggregates, keyed by client_id first. Concurrent
+# misses for the same (client, operation, parameters) key share one upstream call.
+transaction_cache = TTLCache(
+    maxsize=int(os.getenv('TRANSACTION_CACHE_SIZE', 256)),
+    ttl=int(os.getenv('TRANSACTION_CACHE_TTL', 300)),
+    # Keep serving the last good balances and sync while Plaid is failing
+    stale_ttl=int(os.getenv('TRANSACTION_CACHE_STALE_TTL', 3600))
 )
 
-api_client = plaid.ApiClient(configuration)
-client = plaid_api.PlaidApi(api_client)
+def get_links(client_id):
+    """
+    Look up the client's linked items as [(item_id, access_token)],
+    recording the activity so the background scheduler keeps their data
+    warm.
+    """
+    links = state.get_links(client_id)
+    if links and refresh_scheduler:
+        refresh_scheduler.touch(client_id)
+    return links
+
+def load_ledgers(client_id, links):
+    # One Ledger per item, so its lock serializes that item's syncs and backfills
+    with ledgers_lock:
+        current = ledgers.get(client_id, {})
+        if {item_id: ledger.access_token for item_id, ledger in current.items()} != dict(links):
+            if current:
+                # Linked or relinked, possibly by another worker; cached data is stale
+                transaction_cache.invalidate(client_id)
+            stored = {item[0]: item for item in store.get_items(client_id)}
+            updated = {}
+            for item_id, access_token in links:
+                ledger = current.get(item_id)
+                if ledger is None or ledger.access_token != access_token:
+                    ledger = Ledger(store, client_id, item_id, access_token, *stored[item_id][2:])
+                updated[item_id] = ledger
+            current = ledgers[client_id] = updated
+        return list(current.values())
+
+def fan_out(fn, items):
+    """
+    Call fn on every item concurrently on the item pool, so the wait is
+    the slowest institution rather than the sum of all of them
+    """
+    if len(items) == 1:
+        return [fn(items[0])]
+    return list(item_pool.map(fn, items))
+
+def sync_ledger(ledger):
+    return transaction_cache.get_or_load(
+        (ledger.client_id, 'sync', ledger.item_id), lambda: ledger.sync(plaid_client())
+    )
+
+def resync_ledger(ledger):
+    return transaction_cache.reload(
+        (ledger.client_id, 'sync', ledger.item_id), lambda: ledger.sync(plaid_client())
+    )
+
+def get_ledgers(client_id, links):
+    """
+    Return the client's ledgers, syncing each item's delta from Plaid at
+    most once per cache TTL, all items concurrently.
+    """
+    client_ledgers = load_ledgers(client_id, links)
+    fan_out(sync_ledger, client_ledgers)
+    return client_ledgers
+
+def ensure_history(client_ledgers, days):
+    fan_out(lambda ledger: ledger.ensure_history(plaid_client(), days), client_ledgers)
+
+def load_frame(client_id, start_date):
+    """
+    Columnar, carbon-scored view of every linked item's transactions
+    since start_date, merged newest first. Transactions are unique by
+    Plaid transaction_id in the store, so overlapping pages and syncs
+    never count twice.
+    """
+    return TransactionFrame.from_transactions(store.query_transactions(client_id, start_date=start_date))
+
+# Worker pool for independent upstream calls made within one request
+upstream_pool = ThreadPoolExecutor(max_workers=int(os.getenv('UPSTREAM_WORKERS', 16)))
+
+# Worker pool for per-item Plaid calls; separate from upstream_pool, whose
+# tasks fan out to it
+item_pool = ThreadPoolExecutor(max_workers=int(os.getenv('ITEM_WORKERS', 16)))
+
+EMPTY_ACCOUNT_SUMMARY = {
+    "totalBalance": "$0.00",
+    "monthlySpending": "$0.00",
+    "carbonFootprint": "0 tons CO₂",
+    "balanceChange": "0%",
+    "spendingChange": "0%",
+    "carbonChange": "0%"
+}
+
+EMPTY_DASHBOARD = {
+    'transactions': [],
+    'carbon_footprint': [],
+    'financial_overview': [],
+    'account_summary': EMPTY_ACCOUNT_SUMMARY
+}
+
+def get_aggregates(client_id, links):
+    """
+    Return the client's Aggregates across all their items, recomputed
+    only when an item's ledger version or the current date changes.
+    """
+    client_ledgers = get_ledgers(client_id, links)
+    ensure_history(client_ledgers, OVERVIEW_DAYS)
+    today = datetime.now().date()
+    versions = tuple((ledger.item_id, ledger.version) for ledger in client_ledgers)
+    return transaction_cache.get_or_load(
+        (client_id, 'aggregates', versions, today),
+        lambda: Aggregates(load_frame(client_id, today - timedelta(days=OVERVIEW_DAYS)), today)
+    )
+
+def fetch_balances(access_token):
+    # Get account balances
+    accounts_request = AccountsGetRequest(access_token=access_token)
+    accounts_response = plaid_client().accounts_get(accounts_request)
+    accounts = accounts_response['accounts']
+    
+    return {account.account_id: account.balances.current for account in accounts}
+
+def get_balances(client_id, link):
+    item_id, access_token = link
+    return transaction_cache.get_or_load(
+        (client_id, 'balance', item_id),
+        lambda: fetch_balances(access_token)
+    )
+
+def reload_balances(client_id, link):
+    item_id, access_token = link
+    return transaction_cache.reload(
+        (client_id, 'balance', item_id),
+        lambda: fetch_balances(access_token)
+    )
+
+def get_total_balance(client_id, links):
+    # Calculate total balance from all accounts of all items, each account once
+    balances = {}
+    for item_balances in fan_out(lambda link: get_balances(client_id, link), links):
+        balances.update(item_balances)
+    return sum(balance for balance in balances.values() if balance is not None)
+
+def refresh_client(client_id):
+    """
+    Re-sync the client's ledgers and balances and rebuild their
+    aggregates, so user-facing requests find warm data.
+    """
+    links = state.get_links(client_id)
+    if not links:
+        return
+    
+    fan_out(resync_ledger, load_ledgers(client_id, links))
+    fan_out(lambda link: reload_balances(client_id, link), links)
+    get_aggregates(client_id, links)
+
+def fetch_dashboard_inputs(client_id, links):
+    """
+    Fetch balances and aggregates concurrently, so the wait is the slower
+    of the two upstream calls rather than their sum.
+    """
+    balance_future = upstream_pool.submit(get_total_balance, client_id, links)
+    aggregates_future = upstream_pool.submit(get_aggregates, client_id, links)
+    return balance_future.result(), aggregates_future.result()
+
+def data_etag(path, query, client_ledgers, *extra):
+    """
+    Strong ETag for a response computed from the client's ledgers. It
+    covers the route and query, today's date, and each item's sync cursor
+    and history start, which together pin down the stored transactions,
+    plus any `extra` inputs such as the balance total.
+    """
+    parts = [path, query, datetime.now().date().isoformat()]
+    parts += [f'{ledger.item_id}:{ledger.cursor}:{ledger.history_start}' for ledger in client_ledgers]
+    parts += [repr(part) for part in extra]
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:32]
 
-# In-memory storage for access tokens (in production, use a database)
-access_tokens = {}
+def conditional_json(client_ledgers, compute, *extra):
+    """
+    Answer with compute()'s JSON tagged with the data's ETag, or with 304
+    before compute() runs when the client already holds that version in
+    any encoding
+    """
+    etag = data_etag(request.path, request.query_string.decode(), client_ledgers, *extra)
+    for tag in (etag, f'{etag}-br', f'{etag}-gzip'):
+        if request.if_none_match.contains(tag):
+            response = Response(status=304)
+            response.set_etag(tag)
+            break
+    else:
+        response = jsonify(compute())
+        response.set_etag(etag)
+    # Let browsers keep the body but revalidate on every poll
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-# Store conversation history
-conversation_history = {}
+# Background warming of linked clients; set BACKGROUND_REFRESH=0 to disable
+refresh_scheduler = None
+if os.getenv('BACKGROUND_REFRESH', '1') == '1':
+    refresh_scheduler = RefreshScheduler(
+        refresh_client,
+        interval=int(os.getenv('REFRESH_INTERVAL', 240)),
+        workers=int(os.getenv('REFRESH_WORKERS', 4)),
+        active_window=int(os.getenv('REFRESH_ACTIVE_WINDOW', 3600)),
+        # Workers share a per-client lease so Plaid sees one refresh per round
+        claim=state.claim_refresh
+    )
+
+def build_account_summary(aggregates, total_balance):
+    return aggregates.summary_view(total_balance)
+
+def build_dashboard(aggregates, total_balance):
+    return {
+        'transactions': aggregates.transactions_view(),
+        'carbon_footprint': aggregates.carbon_footprint_view(),
+        'financial_overview': aggregates.overview_view(),
+        'account_summary': build_account_summary(aggregates, total_balance)
+    }
+
+def get_insights_data(client_id):
+    """
+    Overview and summary sections the AI insights prompt is built from,
+    computed in-process for the requesting client.
+    """
+    links = get_links(client_id)
+    if not links:
+        return {'financial_overview': [], 'account_summary': EMPTY_ACCOUNT_SUMMARY}
+    
+    total_balance, aggregates = fetch_dashboard_inputs(client_id, links)
+    return {
+        'financial_overview': aggregates.overview_view(),
+        'account_summary': build_account_summary(aggregates, total_balance)
+    }
+
+def load_financial_data(user_id):
+    """
+    Financial data for the chatbot prompt, or None if the user has no
+    linked bank or the fetch fails.
+    """
+    # Get the user's linked items
+    links = get_links(user_id)
+    
+    # Get financial data if any bank is linked
+    financial_data = None
+    if links:
+        try:
+            financial_data = get_aggregates(user_id, links).chat_view()
+            logger.debug("Fetched financial data", extra={'client_id': user_id})
+        except Exception:
+            logger.exception("Error fetching financial data", extra={'client_id': user_id})
+    else:
+        logger.debug("No linked bank for chat user", extra={'client_id': user_id})
+    return financial_data
+
+def remember_exchange(user_id, message, response):
+    # Update conversation history; the store keeps only the last 20 messages
+    return conversations.add_exchange(user_id, message, response)
+
+def sse_event(data, event=None):
+    # Format one Server-Sent Events message
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+@app.before_request
+def start_request_metrics():
+    # Label by URL rule, not raw path, so client ids do not become label values
+    g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+    g.metrics_started = metrics.request_started(g.metrics_route)
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@app.after_request
+def compress_body(response):
+    return compress_response(response, request.accept_encodings)
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # Runs after streamed responses finish, so SSE requests are timed in full
+    if 'metrics_started' in g:
+        status = 500 if error else g.get('metrics_status', 500)
+        metrics.request_finished(g.metrics_route, request.method, status, g.metrics_started)
+
+def cache_samples(field):
+    caches = {'transactions': transaction_cache.stats(), 'llm_responses': response_cache.stats()}
+    return [({'cache': name}, stats[field]) for name, stats in caches.items()]
+
+metrics.registry.callback('greenwealth_cache_hits_total', 'Cache lookups served from the cache', 'counter',
+                          lambda: cache_samples('hits'))
+metrics.registry.callback('greenwealth_cache_misses_total', 'Cache lookups that went upstream', 'counter',
+                          lambda: cache_samples('misses'))
+metrics.registry.callback('greenwealth_cache_hit_ratio', 'Share of cache lookups that hit', 'gauge',
+                          lambda: cache_samples('hit_ratio'))
+metrics.registry.callback('greenwealth_cache_coalesced_total', 'Cache misses that joined an in-flight load', 'counter',
+                          lambda: cache_samples('coalesced'))
+metrics.registry.callback('greenwealth_cache_stale_served_total', 'Stale entries served after a failed load', 'counter',
+                          lambda: cache_samples('stale_served'))
+metrics.registry.callback('greenwealth_cache_entries', 'Entries held in memory', 'gauge',
+                          lambda: cache_samples('size'))
+def conversation_samples():
+    # Only the in-process store holds users in memory
+    users = conversations.stats().get('users')
+    return [({}, users)] if users is not None else []
+
+metrics.registry.callback('greenwealth_conversation_users', 'Users with chat history in memory', 'gauge',
+                          conversation_samples)
+metrics.registry.callback('greenwealth_refresh_scheduled', 'Clients scheduled for background refresh', 'gauge',
+                          lambda: [({}, refresh_scheduler.stats()['scheduled'])] if refresh_scheduler else [])
+metrics.registry.callback('greenwealth_refresh_running', 'Background refreshes in progress', 'gauge',
+                          lambda: [({}, refresh_scheduler.stats()['running'])] if refresh_scheduler else [])
+metrics.registry.callback('greenwealth_refresh_skipped_total', 'Refresh rounds left to the worker holding the lease', 'counter',
+                          lambda: [({}, refresh_scheduler.stats()['skipped'])] if refresh_scheduler else [])
+
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+metrics.registry.callback('greenwealth_circuit_state', 'Upstream circuit: 0 closed, 1 half-open, 2 open', 'gauge',
+                          lambda: [({'service': name}, CIRCUIT_STATES[stats['state']])
+                                   for name, stats in circuit_stats().items()])
+metrics.registry.callback('greenwealth_circuit_rejected_total', 'Calls failed fast by an open circuit', 'counter',
+                          lambda: [({'service': name}, stats['rejected']) for name, stats in circuit_stats().items()])
+
+metrics.registry.callback('greenwealth_llm_calls', 'LLM calls admitted to the pool, by state', 'gauge',
+                          lambda: llm_samples(('running', 'queued')))
+metrics.registry.callback('greenwealth_llm_shed_total', 'LLM calls shed because the queue was full', 'counter',
+                          lambda: llm_samples(('shed',)))
+metrics.registry.callback('greenwealth_llm_timed_out_total', 'LLM calls abandoned at their deadline', 'counter',
+                          lambda: llm_samples(('timed_out',)))
+metrics.registry.callback('greenwealth_llm_rate_limited_total', 'LLM requests refused by per-client rate limits', 'counter',
+                          lambda: [({}, llm_rate_limiter.limited)])
+
+def llm_samples(fields):
+    pools = {'sync': llm_pool.stats(), 'async': async_llm_gate.stats()}
+    return [
+        (dict({'pool': pool}, **({'state': field} if len(fields) > 1 else {})), stats[field])
+        for pool, stats in pools.items() for field in fields
+    ]
+
+@app.errorhandler(CircuitOpenError)
+def upstream_unavailable(e):
+    return jsonify({"error": str(e)}), 503, {'Retry-After': str(int(CIRCUIT_RESET_TIMEOUT))}
+
+@app.errorhandler(AdmissionError)
+def llm_request_refused(e):
+    return jsonify({"error": str(e)}), e.status, {'Retry-After': str(e.retry_after)}
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/create_link_token', methods=['POST'])
 def create_link_token():
@@ -71,7 +438,7 @@ def create_link_token():
             )
         )
         
-        response = client.link_token_create(link_request)
+        response = plaid_client().link_token_create(link_request)
         
         # Extract link_token specifically
         link_token = response['link_token']
@@ -81,10 +448,12 @@ def create_link_token():
         })
     
     except plaid.ApiException as e:
-        print(f"Plaid API error: {e.body}")
+        logger.error("Plaid API error creating link token", extra={'plaid_error': e.body})
         return jsonify({"error": e.body}), 400
+    except CircuitOpenError:
+        raise
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.exception("Unexpected error creating link token")
         return jsonify({"error": str(e)}), 500
 
 
@@ -96,24 +465,28 @@ def exchange_public_token():
         client_id = request_data.get('client_id')
         
         if not client_id:
-            print("No client_id provided in request")  # Debug log
+            logger.warning("No client_id provided in token exchange")
             return jsonify({"error": "client_id is required"}), 400
             
-        print(f"Exchanging public token for client {client_id}")  # Debug log
-        print(f"Current access tokens: {access_tokens}")  # Debug log
+        logger.info("Exchanging public token", extra={'client_id': client_id})
         
         exchange_request = ItemPublicTokenExchangeRequest(
             public_token=public_token
         )
         
-        response = client.item_public_token_exchange(exchange_request)
+        response = plaid_client().item_public_token_exchange(exchange_request)
         access_token = response['access_token']
         item_id = response['item_id']
         
-        # Store the access token for this client
-        access_tokens[client_id] = access_token
-        print(f"Stored access token for client {client_id}")  # Debug log
-        print(f"Updated access tokens: {access_tokens}")  # Debug log
+        # Add the item to the client's links; earlier items stay linked
+        # load_ledgers picks up the new item on the next request
+        state.save_link(client_id, item_id, access_token)
+        transaction_cache.invalidate(client_id)
+        
+        # Warm the new item's transactions, balances and aggregates right away
+        if refresh_scheduler:
+            refresh_scheduler.schedule(client_id)
+        logger.info("Linked item", extra={'client_id': client_id, 'item_id': item_id})
         
         return jsonify({
             'access_token': access_token,
@@ -128,140 +501,92 @@ def exchange_public_token():
 def get_transactions():
     try:
         client_id = request.args.get('client_id', 'default')
-        access_token = access_tokens.get(client_id)
+        links = get_links(client_id)
         
-        if not access_token:
+        if not links:
             # Return empty list if no bank connected
             return jsonify([])
         
-        # Set date range for transactions
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=30)
-        
-        plaid_request = TransactionsGetRequest(
-            access_token=access_token,
-            start_date=start_date,
-            end_date=end_date,
-            options=TransactionsGetRequestOptions(
-                include_personal_finance_category=True
-            )
-        )
-        
-        response = client.transactions_get(plaid_request)
-        transactions = response['transactions']
-        
-        # Process transactions to match frontend format
-        processed_transactions = []
-        for transaction in transactions:
-            # Map Plaid categories to our carbon impact categories
-            carbon_impact = map_category_to_carbon_impact(transaction.personal_finance_category.primary)
-            
-            processed_transaction = {
-                'id': transaction.transaction_id,
-                'name': transaction.merchant_name or transaction.name,
-                'amount': f"${abs(transaction.amount):.2f}",
-                'date': transaction.date.strftime('%b %d, %Y'),
-                'category': transaction.personal_finance_category.primary,
-                'carbon': f"{calculate_carbon_footprint(transaction.amount, carbon_impact['factor'])} kg",
-                'impact': carbon_impact['impact']
-            }
-            processed_transactions.append(processed_transaction)
-        
-        return jsonify(processed_transactions)
+        client_ledgers = get_ledgers(client_id, links)
+        category = request.args.get('category')
+        if category:
+            # Filtered lists come straight from the (client_id, category) index
+            def filtered_transactions():
+                start_date = datetime.now().date() - timedelta(days=RECENT_DAYS)
+                transactions = store.query_transactions(client_id, start_date=start_date, category=category)
+                return process_transactions(TransactionFrame.from_transactions(transactions))
+            return conditional_json(client_ledgers, filtered_transactions)
+        
+        ensure_history(client_ledgers, OVERVIEW_DAYS)
+        return conditional_json(client_ledgers, lambda: get_aggregates(client_id, links).transactions_view())
     
     except plaid.ApiException as e:
         return jsonify({"error": e.body}), 400
+    except CircuitOpenError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def map_category_to_carbon_impact(category):
-    # Find them from API doc
-    category_map = {
-        # using GHG Protocol coefficient for estimation for transportation
-        'TRANSPORTATION': {'impact': 'high', 'factor': 1.853},
-        # using U.S. Government (EPA) coefficient fo estimation for travel
-        'TRAVEL': {'impact': 'high', 'factor': 1.278},
-        # using  U.S. Government (EPA) coefficient calc for estimation for food
-        'FOOD_AND_DRINK': {'impact': 'medium', 'factor': 0.255}, #
-        # using U.S. Government (EPA) coefficient for estimation for general merchandise
-        'GENERAL_MERCHANDISE': {'impact': 'medium', 'factor': 0.194},
-        # using U.S. Government (EPA) coefficient fo estimation for home improvement
-        'HOME_IMPROVEMENT': {'impact': 'medium', 'factor': 0.2678},
-        # using U.S. Government (EPA) coefficient fo estimation for rent and utilities
-        'RENT_AND_UTILITIES': {'impact': 'medium', 'factor': 0.1211},
-        # using U.S. Government (EPA) coefficient fo estimation for general services
-        'GENERAL_SERVICES': {'impact': 'low', 'factor': 0.1417},
-    }
-    
-    return category_map.get(category, {'impact': 'low', 'factor': 0.05})
+# Furthest back an export backfills from Plaid (transactions_get serves up to two years)
+EXPORT_HISTORY_DAYS = int(os.getenv('EXPORT_HISTORY_DAYS', 730))
+
+def parse_date(value):
+    return date.fromisoformat(value) if value else None
 
-# Modify them later
-def calculate_carbon_footprint(amount, factor):
-    return round(abs(float(amount)) * factor, 1)
+@app.route('/api/transactions/export', methods=['GET'])
+def export_transactions():
+    """
+    Stream the client's transactions with carbon scores as NDJSON or CSV,
+    optionally limited to start_date..end_date (YYYY-MM-DD) and a primary
+    category. Rows are read, scored and sent one bounded batch at a time.
+    """
+    try:
+        client_id = request.args.get('client_id', 'default')
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        
+        try:
+            start_date = parse_date(request.args.get('start_date'))
+            end_date = parse_date(request.args.get('end_date'))
+        except ValueError:
+            return jsonify({"error": "start_date and end_date must be YYYY-MM-DD"}), 400
+        
+        links = get_links(client_id)
+        batches = []
+        if links:
+            client_ledgers = get_ledgers(client_id, links)
+            # Without a start_date the export covers all the history Plaid serves
+            days = EXPORT_HISTORY_DAYS
+            if start_date is not None:
+                days = min((datetime.now().date() - start_date).days, EXPORT_HISTORY_DAYS)
+            ensure_history(client_ledgers, days)
+            batches = store.iter_transactions(
+                client_id, start_date=start_date, end_date=end_date, category=request.args.get('category')
+            )
+        
+        return Response(
+            stream_with_context(export_chunks(batches, export_format)),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={'Content-Disposition': f'attachment; filename="transactions.{export_format}"'}
+        )
+    
+    except plaid.ApiException as e:
+        return jsonify({"error": e.body}), 400
 
 @app.route('/api/carbon_footprint', methods=['GET'])
 def get_carbon_footprint():
     try:
         client_id = request.args.get('client_id', 'default')
-        access_token = access_tokens.get(client_id)
+        links = get_links(client_id)
         
-        if not access_token:
+        if not links:
             # Return empty data if no bank connected
             return jsonify([])
         
-        # Set date range for transactions
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=30)
-        
-        plaid_request = TransactionsGetRequest(
-            access_token=access_token,
-            start_date=start_date,
-            end_date=end_date,
-            options=TransactionsGetRequestOptions(
-                include_personal_finance_category=True
-            )
-        )
-        
-        response = client.transactions_get(plaid_request)
-        transactions = response['transactions']
-        
-        # Calculate carbon footprint by category
-        carbon_by_category = {}
-        for transaction in transactions:
-            # Skip non-carbon-emitting categories
-            category = transaction.personal_finance_category.primary
-            if category in ['INCOME', 'LOAN_PAYMENTS', 'TRANSFER_IN', 'TRANSFER_OUT']:
-                continue
-                
-            carbon_impact = map_category_to_carbon_impact(category)
-            carbon_amount = calculate_carbon_footprint(transaction.amount, carbon_impact['factor'])
-            
-            if category in carbon_by_category:
-                carbon_by_category[category] += carbon_amount
-            else:
-                carbon_by_category[category] = carbon_amount
-        
-        # Format for pie chart
-        carbon_data = []
-        colors = {
-            'TRANSPORTATION': '#ef4444',
-            'FOOD_AND_DRINK': '#f97316',
-            'RENT_AND_UTILITIES': '#3b82f6',
-            'GENERAL_MERCHANDISE': '#8b5cf6',
-            'GENERAL_SERVICES': '#10b981',
-            'TRAVEL': '#ec4899',
-            'HOME_IMPROVEMENT': '#14b8a6'
-        }
-        
-        for category, value in carbon_by_category.items():
-            display_name = category.replace('_', ' ').title()
-            carbon_data.append({
-                'name': display_name,
-                'value': round(value / 1000, 1),  # Convert to tons
-                'color': colors.get(category, '#6b7280')
-            })
-        
-        return jsonify(carbon_data)
+        client_ledgers = get_ledgers(client_id, links)
+        ensure_history(client_ledgers, OVERVIEW_DAYS)
+        return conditional_json(client_ledgers, lambda: get_aggregates(client_id, links).carbon_footprint_view())
     
     except plaid.ApiException as e:
         return jsonify({"error": e.body}), 400
@@ -270,62 +595,15 @@ def get_carbon_footprint():
 def get_financial_overview():
     try:
         client_id = request.args.get('client_id', 'default')
-        access_token = access_tokens.get(client_id)
+        links = get_links(client_id)
         
-        if not access_token:
+        if not links:
             # Return empty data if no bank connected
             return jsonify([])
         
-        # Set date range for transactions (last 6 months)
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=180)
-        
-        plaid_request = TransactionsGetRequest(
-            access_token=access_token,
-            start_date=start_date,
-            end_date=end_date
-        )
-        
-        response = client.transactions_get(plaid_request)
-        transactions = response['transactions']
-        
-        # Group transactions by month
-        months = {}
-        for transaction in transactions:
-            month = transaction.date.strftime('%b')
-            amount = abs(transaction.amount)
-            
-            if month not in months:
-                months[month] = {'Spending': 0, 'Income': 0}
-            
-            # Negative amounts are expenses, positive are income in Plaid
-            if transaction.amount < 0:
-                months[month]['Spending'] += amount
-            else:
-                months[month]['Income'] += amount
-        
-        # Calculate savings (Income - Spending)
-        for month in months:
-            months[month]['Saving'] = max(0, months[month]['Income'] - months[month]['Spending'])
-        
-        # Format for chart
-        overview_data = []
-        for month, data in months.items():
-            overview_data.append({
-                'name': month,
-                'Spending': round(data['Spending'], 2),
-                'Saving': round(data['Saving'], 2),
-                'Income': round(data['Income'], 2)
-            })
-        
-        # Sort by month
-        month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        overview_data.sort(key=lambda x: month_order.index(x['name']))
-        
-        # Take only the last 6 months
-        overview_data = overview_data[-6:]
-        
-        return jsonify(overview_data)
+        client_ledgers = get_ledgers(client_id, links)
+        ensure_history(client_ledgers, OVERVIEW_DAYS)
+        return conditional_json(client_ledgers, lambda: get_aggregates(client_id, links).overview_view())
     
     except plaid.ApiException as e:
         return jsonify({"error": e.body}), 400
@@ -335,213 +613,157 @@ def get_financial_overview():
 def get_account_summary():
     try:
         client_id = request.args.get('client_id', 'default')
-        access_token = access_tokens.get(client_id)
+        links = get_links(client_id)
         
-        if not access_token:
+        if not links:
             # Return default data if no bank connected
-            return jsonify({
-                "totalBalance": "$0.00",
-                "monthlySpending": "$0.00",
-                "carbonFootprint": "0 tons CO₂",
-                "balanceChange": "0%",
-                "spendingChange": "0%",
-                "carbonChange": "0%"
-            })
-        
-        # Get account balances
-        accounts_request = AccountsGetRequest(access_token=access_token)
-        accounts_response = client.accounts_get(accounts_request)
-        accounts = accounts_response['accounts']
-        
-        # Calculate total balance from all accounts
-        total_balance = sum(account.balances.current for account in accounts)
-        
-        # Get transactions for the last month to calculate spending
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=30)
-        
-        transactions_request = TransactionsGetRequest(
-            access_token=access_token,
-            start_date=start_date,
-            end_date=end_date,
-            options=TransactionsGetRequestOptions(
-                include_personal_finance_category=True
-            )
-        )
+            return jsonify(EMPTY_ACCOUNT_SUMMARY)
         
-        transactions_response = client.transactions_get(transactions_request)
-        transactions = transactions_response['transactions']
-        
-        # Calculate monthly spending (negative transactions)
-        monthly_spending = sum(abs(transaction.amount) for transaction in transactions if transaction.amount < 0)
-        
-        # Calculate carbon footprint based on transactions
-        carbon_footprint = 0
-        for transaction in transactions:
-            category = transaction.personal_finance_category.primary
-            carbon_impact = map_category_to_carbon_impact(category)
-            carbon_amount = calculate_carbon_footprint(transaction.amount, carbon_impact['factor'])
-            carbon_footprint += carbon_amount
-        
-        # Convert to tons
-        carbon_footprint = round(carbon_footprint / 1000, 1)
-        
-        # Generate mock changes (in a real app, you would compare with previous periods)
-        balance_change = round(random.uniform(1.0, 3.5), 1)
-        spending_change = round(random.uniform(-5.0, -2.0), 1)
-        carbon_change = round(random.uniform(-15.0, -8.0), 1)
-        
-        summary = {
-            "totalBalance": f"${total_balance:,.2f}",
-            "monthlySpending": f"${monthly_spending:,.2f}",
-            "carbonFootprint": f"{carbon_footprint} tons CO₂",
-            "balanceChange": f"+{balance_change}%",
-            "spendingChange": f"{spending_change}%",
-            "carbonChange": f"{carbon_change}%"
-        }
+        total_balance, aggregates = fetch_dashboard_inputs(client_id, links)
+        summary = build_account_summary(aggregates, total_balance)
         
         return jsonify(summary)
     
     except plaid.ApiException as e:
         return jsonify({"error": e.body}), 400
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/dashboard', methods=['GET'])
+def get_dashboard():
+    try:
+        client_id = request.args.get('client_id', 'default')
+        links = get_links(client_id)
+        
+        if not links:
+            # Return empty sections if no bank connected
+            return jsonify(EMPTY_DASHBOARD)
+        
+        # Balances are not covered by the ledgers' tag: fetch them alongside
+        # the sync and fold the total into the dashboard's ETag
+        balance_future = upstream_pool.submit(get_total_balance, client_id, links)
+        client_ledgers = get_ledgers(client_id, links)
+        ensure_history(client_ledgers, OVERVIEW_DAYS)
+        total_balance = balance_future.result()
+        return conditional_json(
+            client_ledgers,
+            lambda: build_dashboard(get_aggregates(client_id, links), total_balance),
+            total_balance
+        )
+    
+    except plaid.ApiException as e:
+        return jsonify({"error": e.body}), 400
+    except CircuitOpenError:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/cache_stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        'transactions': transaction_cache.stats(),
+        'llm_responses': response_cache.stats(),
+        'conversations': conversations.stats(),
+        'refresh': refresh_scheduler.stats() if refresh_scheduler else None,
+        'circuits': circuit_stats(),
+        'llm': {'sync': llm_pool.stats(), 'async': async_llm_gate.stats()}
+    })
+
 @app.route('/api/ai-insights', methods=['GET'])
 def get_ai_insights():
     try:
-        data = fetch_data()
-        formatted_data = format_data(data)
-        recommendations = get_recommendations(formatted_data)
+        client_id = request.args.get('client_id', 'default')
+        data = fetch_data(client_id, get_insights_data)
+        recommendations = get_cached_recommendations(data, client_id)
         if not recommendations:
             return jsonify([])
         return jsonify(recommendations)
+    except (AdmissionError, CircuitOpenError):
+        raise
     except Exception as e:
-        print(f"Error generating AI insights: {str(e)}")
+        logger.exception("Error generating AI insights")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
-        print("Received chat request")  # Debug log
         data = request.get_json()
-        print(f"Request data: {data}")  # Debug log
         
         message = data.get('message')
         user_id = data.get('user_id', 'default')
         
         if not message:
-            print("No message provided")  # Debug log
+            logger.debug("Chat request without a message")
             return jsonify({"error": "Message is required"}), 400
         
-        print(f"Processing message for user {user_id}: {message}")  # Debug log
-        print(f"Available access tokens: {access_tokens}")  # Debug log
-        
-        # Get or initialize conversation history for this user
-        if user_id not in conversation_history:
-            conversation_history[user_id] = []
-        
-        # Get access token for the user
-        access_token = access_tokens.get(user_id)
-        print(f"Access token for user {user_id}: {access_token}")  # Debug log
-        
-        # Get financial data if access token exists
-        financial_data = None
-        if access_token:
-            try:
-                # Get transactions for the last 30 days
-                end_date = datetime.now().date()
-                start_date = end_date - timedelta(days=30)
-                
-                plaid_request = TransactionsGetRequest(
-                    access_token=access_token,
-                    start_date=start_date,
-                    end_date=end_date,
-                    options=TransactionsGetRequestOptions(
-                        include_personal_finance_category=True
-                    )
-                )
-                
-                response = client.transactions_get(plaid_request)
-                transactions = response['transactions']
-                print(f"Retrieved {len(transactions)} transactions")  # Debug log
-                
-                # Process transactions
-                spending_by_category = {}
-                total_spending = 0
-                carbon_by_category = {}
-                total_carbon = 0
-                total_income = 0
-                
-                for transaction in transactions:
-                    if transaction.amount < 0:  # Expenses
-                        category = transaction.personal_finance_category.primary
-                        amount = abs(transaction.amount)
-                        
-                        # Calculate spending by category
-                        if category in spending_by_category:
-                            spending_by_category[category] += amount
-                        else:
-                            spending_by_category[category] = amount
-                        
-                        total_spending += amount
-                        
-                        # Calculate carbon impact
-                        carbon_impact = map_category_to_carbon_impact(category)
-                        carbon_amount = calculate_carbon_footprint(transaction.amount, carbon_impact['factor'])
-                        
-                        if category in carbon_by_category:
-                            carbon_by_category[category] += carbon_amount
-                        else:
-                            carbon_by_category[category] = carbon_amount
-                        
-                        total_carbon += carbon_amount
-                    else:  # Income
-                        total_income += transaction.amount
-                
-                financial_data = {
-                    'spending_by_category': spending_by_category,
-                    'total_spending': total_spending,
-                    'carbon_by_category': carbon_by_category,
-                    'total_carbon': total_carbon,
-                    'total_income': total_income,
-                    'transaction_count': len(transactions)
-                }
-                print(f"Fetched financial data: {financial_data}")  # Debug log
-            except Exception as e:
-                print(f"Error fetching financial data: {str(e)}")
-                print(f"Access token: {access_token}")  # Debug log
-                print(f"User ID: {user_id}")  # Debug log
-                import traceback
-                print(f"Traceback: {traceback.format_exc()}")  # Debug log
-        else:
-            print(f"No access token found for user {user_id}")  # Debug log
-            print(f"Available access tokens: {access_tokens}")  # Debug log
+        logger.debug("Processing chat message", extra={'client_id': user_id, 'message_length': len(message)})
+        llm_rate_limiter.check(user_id)
         
-        # Get response from chatbot
-        print("Getting response from chatbot...")  # Debug log
-        response = get_chat_response(message, conversation_history[user_id], financial_data)
-        print(f"Chatbot response: {response}")  # Debug log
+        # Get conversation history for this user
+        history = conversations.get(user_id)
         
-        # Update conversation history
-        conversation_history[user_id].append({"role": "user", "content": message})
-        conversation_history[user_id].append({"role": "assistant", "content": response})
+        financial_data = load_financial_data(user_id)
         
-        # Keep only the last 10 messages to prevent context from getting too long
-        if len(conversation_history[user_id]) > 20:
-            conversation_history[user_id] = conversation_history[user_id][-20:]
+        # Get response from chatbot
+        response = get_chat_response(message, history, financial_data)
+        
+        history = remember_exchange(user_id, message, response)
         
         return jsonify({
             "response": response,
-            "conversation_history": conversation_history[user_id]
+            "conversation_history": history
         })
         
+    except (AdmissionError, CircuitOpenError):
+        raise
     except Exception as e:
-        print(f"Error in chat endpoint: {str(e)}")  # Debug log
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")  # Debug log
+        logger.exception("Error in chat endpoint")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /api/chat. Tokens are relayed as Server-Sent
+    Events as they arrive; a final "done" event carries the full reply
+    and the conversation history, which is saved once the stream ends.
+    """
+    data = request.get_json()
+    message = data.get('message')
+    user_id = data.get('user_id', 'default')
+    
+    if not message:
+        return jsonify({"error": "Message is required"}), 400
+    
+    # Refuse before the stream starts, while a status code can still say so
+    llm_rate_limiter.check(user_id)
+    llm_pool.ensure_capacity()
+    
+    history = conversations.get(user_id)
+    financial_data = load_financial_data(user_id)
+    
+    def generate():
+        chunks = []
+        try:
+            for chunk in stream_chat_response(message, history, financial_data):
+                chunks.append(chunk)
+                yield sse_event({"token": chunk})
+        except AdmissionError as e:
+            yield sse_event({"error": str(e), "retry_after": e.retry_after}, event="error")
+            return
+        except CircuitOpenError as e:
+            yield sse_event({"error": str(e), "retry_after": int(CIRCUIT_RESET_TIMEOUT)}, event="error")
+            return
+        
+        response = "".join(chunks)
+        yield sse_event({
+            "response": response,
+            "conversation_history": remember_exchange(user_id, message, response)
+        }, event="done")
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
 
 if __name__ == '__main__':
     app.run(debug=True, port=5001)
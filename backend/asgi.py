@@ -0,0 +1,204 @@
+"""
+Async serving mode. The upstream-heavy routes (dashboard, chat, AI insights)
+are served natively on the event loop: Cohere is awaited through its async
+client, and blocking Plaid calls go through a bounded executor bridge. Every
+other route falls through to the Flask app.
+
+Run with: uvicorn asgi:app --port 5001
+"""
+import asyncio
+import functools
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import plaid
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_etags
+import app as sync_app
+from admission import AdmissionError, async_llm_gate, llm_rate_limiter
+from circuit import CircuitOpenError
+from chatbot import get_chat_response_async, stream_chat_response_async
+from cohere_insights import get_cached_recommendations_async, fetch_data
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Threads available for blocking Plaid SDK calls and state lookups (redis-py
+# round trips, SQLite reads and writes) across all in-flight requests
+plaid_executor = ThreadPoolExecutor(max_workers=int(os.getenv('ASGI_PLAID_WORKERS', 64)))
+
+# Threads serving the Flask routes that have no async version
+WSGI_WORKERS = int(os.getenv('ASGI_WSGI_WORKERS', 32))
+
+
+async def run_blocking(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(plaid_executor, fn, *args)
+
+
+def observed(route, endpoint):
+    """
+    Record request metrics for a native route; mounted Flask routes record
+    their own. Streaming responses are timed until the stream starts.
+    """
+    @functools.wraps(endpoint)
+    async def observed_endpoint(request):
+        started = metrics.request_started(route)
+        status = 500
+        try:
+            response = await endpoint(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.request_finished(route, request.method, status, started)
+    return observed_endpoint
+
+
+async def dashboard(request):
+    try:
+        client_id = request.query_params.get('client_id', 'default')
+        links = await run_blocking(sync_app.get_links, client_id)
+
+        if not links:
+            return JSONResponse(sync_app.EMPTY_DASHBOARD)
+
+        def synced_ledgers():
+            client_ledgers = sync_app.get_ledgers(client_id, links)
+            sync_app.ensure_history(client_ledgers, sync_app.OVERVIEW_DAYS)
+            return client_ledgers
+
+        client_ledgers, total_balance = await asyncio.gather(
+            run_blocking(synced_ledgers),
+            run_blocking(sync_app.get_total_balance, client_id, links)
+        )
+        # Same validator as the Flask route; answer 304 before aggregating
+        etag = sync_app.data_etag(request.url.path, request.url.query, client_ledgers, total_balance)
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+        if parse_etags(request.headers.get('if-none-match')).contains(etag):
+            return Response(status_code=304, headers=headers)
+
+        aggregates = await run_blocking(sync_app.get_aggregates, client_id, links)
+        return JSONResponse(sync_app.build_dashboard(aggregates, total_balance), headers=headers)
+
+    except CircuitOpenError as e:
+        return upstream_unavailable(e)
+    except plaid.ApiException as e:
+        return JSONResponse({"error": e.body}, status_code=400)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+def upstream_unavailable(e):
+    return JSONResponse({"error": str(e)}, status_code=503,
+                        headers={'Retry-After': str(int(sync_app.CIRCUIT_RESET_TIMEOUT))})
+
+
+def llm_request_refused(e):
+    return JSONResponse({"error": str(e)}, status_code=e.status, headers={'Retry-After': str(e.retry_after)})
+
+
+async def chat(request):
+    try:
+        data = await request.json()
+        message = data.get('message')
+        user_id = data.get('user_id', 'default')
+
+        if not message:
+            return JSONResponse({"error": "Message is required"}, status_code=400)
+
+        llm_rate_limiter.check(user_id)
+        history = await run_blocking(sync_app.conversations.get, user_id)
+        financial_data = await run_blocking(sync_app.load_financial_data, user_id)
+        response = await get_chat_response_async(message, history, financial_data)
+
+        return JSONResponse({
+            "response": response,
+            "conversation_history": await run_blocking(sync_app.remember_exchange, user_id, message, response)
+        })
+
+    except AdmissionError as e:
+        return llm_request_refused(e)
+    except CircuitOpenError as e:
+        return upstream_unavailable(e)
+    except Exception as e:
+        logger.exception("Error in chat endpoint")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def chat_stream(request):
+    data = await request.json()
+    message = data.get('message')
+    user_id = data.get('user_id', 'default')
+
+    if not message:
+        return JSONResponse({"error": "Message is required"}, status_code=400)
+
+    # Refuse before the stream starts, while a status code can still say so
+    try:
+        llm_rate_limiter.check(user_id)
+        async_llm_gate.ensure_capacity()
+    except AdmissionError as e:
+        return llm_request_refused(e)
+
+    history = await run_blocking(sync_app.conversations.get, user_id)
+    financial_data = await run_blocking(sync_app.load_financial_data, user_id)
+
+    async def generate():
+        chunks = []
+        try:
+            async for chunk in stream_chat_response_async(message, history, financial_data):
+                chunks.append(chunk)
+                yield sync_app.sse_event({"token": chunk})
+        except AdmissionError as e:
+            yield sync_app.sse_event({"error": str(e), "retry_after": e.retry_after}, event="error")
+            return
+        except CircuitOpenError as e:
+            yield sync_app.sse_event({"error": str(e), "retry_after": int(sync_app.CIRCUIT_RESET_TIMEOUT)}, event="error")
+            return
+
+        response = "".join(chunks)
+        saved = await run_blocking(sync_app.remember_exchange, user_id, message, response)
+        yield sync_app.sse_event({"response": response, "conversation_history": saved}, event="done")
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=sync_app.SSE_HEADERS)
+
+
+async def ai_insights(request):
+    try:
+        client_id = request.query_params.get('client_id', 'default')
+        data = await run_blocking(fetch_data, client_id, sync_app.get_insights_data)
+        recommendations = await get_cached_recommendations_async(data, client_id)
+        if not recommendations:
+            return JSONResponse([])
+        return JSONResponse(recommendations)
+    except AdmissionError as e:
+        return llm_request_refused(e)
+    except CircuitOpenError as e:
+        return upstream_unavailable(e)
+    except Exception as e:
+        logger.exception("Error generating AI insights")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/dashboard', observed('/api/dashboard', dashboard), methods=['GET']),
+        Route('/api/chat', observed('/api/chat', chat), methods=['POST']),
+        Route('/api/chat/stream', observed('/api/chat/stream', chat_stream), methods=['POST']),
+        Route('/api/ai-insights', observed('/api/ai-insights', ai_insights), methods=['GET']),
+        Mount('/', WSGIMiddleware(sync_app.app, workers=WSGI_WORKERS)),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ]
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=5001)
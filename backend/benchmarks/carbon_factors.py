@@ -0,0 +1,100 @@
+"""
+Carbon scoring cost and coverage: the original per-transaction lookup
+of seven primary-category factors against the compiled emission-factor
+table scored in one batch. Coverage counts how many transactions were
+priced by merchant, by detailed category, or fell back to the primary
+category or the default factor.
+
+Usage (from backend/):
+    python benchmarks/carbon_factors.py --transactions 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import fakes
+from carbon import (
+    EMISSION_FACTORS, EMISSION_FACTORS_PATH, EmissionFactors,
+    map_category_to_carbon_impact, normalize_merchant, score
+)
+from storage import normalize_transaction
+
+
+def per_transaction_primary(transactions):
+    # The scoring this replaces: one dict lookup and rounding per item
+    return [round(abs(t.amount) * map_category_to_carbon_impact(t.category)['factor'], 1) for t in transactions]
+
+
+def compiled_batch(transactions):
+    amounts = np.fromiter((t.amount for t in transactions), dtype=np.float64, count=len(transactions))
+    factors = EMISSION_FACTORS.factors(
+        [t.category for t in transactions],
+        [t.detailed_category for t in transactions],
+        [t.merchant_name for t in transactions]
+    )
+    return score(amounts, factors)
+
+
+def best_of(runs, fn, *args):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), statistics.median(timings)
+
+
+def coverage(transactions):
+    counts = {'merchant': 0, 'detailed': 0, 'primary': 0, 'default': 0}
+    for t in transactions:
+        if t.merchant_name and EMISSION_FACTORS.merchant_factor(t.merchant_name, prefix=t.detailed_category is None) is not None:
+            counts['merchant'] += 1
+        elif t.detailed_category in EMISSION_FACTORS.detailed:
+            counts['detailed'] += 1
+        elif t.category in EMISSION_FACTORS.primary:
+            counts['primary'] += 1
+        else:
+            counts['default'] += 1
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--transactions', type=int, default=100000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    transactions = [normalize_transaction(t) for t in fakes.synthetic_transactions(args.transactions)]
+
+    started = time.perf_counter()
+    EmissionFactors.load(EMISSION_FACTORS_PATH)
+    compile_time = time.perf_counter() - started
+
+    print(f'{args.transactions} transactions, best and median of {args.runs} runs')
+    print(f'{"compile factor table":<28} {compile_time * 1000:>9.2f} ms')
+    for label, fn in (('per-transaction primary', per_transaction_primary), ('compiled batch', compiled_batch)):
+        best, median = best_of(args.runs, fn, transactions)
+        print(f'{label:<28} {best * 1000:>9.2f} ms {median * 1000:>9.2f} ms')
+
+    categories = [t.category for t in transactions]
+    detailed = [t.detailed_category for t in transactions]
+    merchants = [t.merchant_name for t in transactions]
+    best, median = best_of(args.runs, EMISSION_FACTORS.factors, categories, detailed, merchants)
+    print(f'{"factors() alone":<28} {best * 1000:>9.2f} ms {median * 1000:>9.2f} ms')
+    print(f'merchant normalization cache: {normalize_merchant.cache_info()}')
+
+    old = np.array(per_transaction_primary(transactions))
+    new = compiled_batch(transactions)
+    print(f'total carbon: primary-only {old.sum() / 1000:,.1f} t, compiled {new.sum() / 1000:,.1f} t')
+    print('priced by:', ', '.join(f'{source} {count}' for source, count in coverage(transactions).items()))
+
+
+if __name__ == '__main__':
+    main()
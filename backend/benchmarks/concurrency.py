@@ -0,0 +1,177 @@
+"""
+Concurrent-user throughput of the sync Flask app versus the ASGI app,
+with Plaid and Cohere replaced by fakes that sleep for a fixed latency.
+The ttfb column is the median time to the first response byte, which
+for chat-stream is the time to the first token.
+
+The sync app is served by a fixed pool of worker threads, like a gunicorn
+worker with --threads. Each user sends its requests one after another.
+
+Usage (from backend/):
+    python benchmarks/concurrency.py --route chat --users 200
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CLIENT_ID = 'bench'
+
+ROUTES = {
+    'chat': ('POST', '/api/chat', {'message': 'How can I cut my emissions?', 'user_id': CLIENT_ID}),
+    'chat-stream': ('POST', '/api/chat/stream', {'message': 'How can I cut my emissions?', 'user_id': CLIENT_ID}),
+    'dashboard': ('GET', f'/api/dashboard?client_id={CLIENT_ID}', None),
+    'ai-insights': ('GET', f'/api/ai-insights?client_id={CLIENT_ID}', None),
+}
+
+
+def serve(mode, port, threads, plaid_latency, cohere_latency):
+    import fakes
+    fakes.install(plaid_latency=plaid_latency, cohere_latency=cohere_latency)
+    os.environ['GREENWEALTH_DB_PATH'] = os.path.join(tempfile.mkdtemp(), f'bench-{mode}.db')
+    # Compare the server models, not admission control: every user shares
+    # one client id, and the LLM pool should not cap either app
+    os.environ.setdefault('LLM_BURST', '1000000')
+    os.environ.setdefault('LLM_WORKERS', '10000')
+    os.environ.setdefault('WORKER_THREADS', str(threads))
+    os.environ.setdefault('LLM_RESERVED_THREADS', '0')
+    os.chdir(BACKEND_DIR)
+
+    import app as sync_app
+    sync_app.store.save_item(CLIENT_ID, f'item-{CLIENT_ID}', f'access-{CLIENT_ID}')
+
+    if mode == 'async':
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.app, port=port, log_level='warning')
+        return
+
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._handle, request, client_address)
+
+        def _handle(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    server = PooledWSGIServer('127.0.0.1', port, sync_app.app)
+    server.request_queue_size = 1024
+    server.serve_forever()
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+async def drive(port, route, users, requests_per_user):
+    import aiohttp
+
+    method, path, body = ROUTES[route]
+    url = f'http://127.0.0.1:{port}{path}'
+    latencies = []
+    first_bytes = []
+    errors = 0
+
+    async def user(session):
+        nonlocal errors
+        for _ in range(requests_per_user):
+            started = time.monotonic()
+            try:
+                async with session.request(method, url, json=body) as response:
+                    await response.content.readany()
+                    first_bytes.append(time.monotonic() - started)
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.monotonic() - started)
+
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=600)
+    # aiohttp's brotli decoding needs a newer Brotli than requirements.txt
+    # pins, and the sync app compresses larger chat replies
+    headers = {'Accept-Encoding': 'gzip'}
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+        # Warm the ledger so the timed run measures steady state
+        async with session.request(method, url, json=body) as response:
+            await response.read()
+
+        started = time.monotonic()
+        await asyncio.gather(*(user(session) for _ in range(users)))
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    first_bytes.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': elapsed,
+        'rps': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'ttfb': first_bytes[len(first_bytes) // 2] if first_bytes else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--route', choices=sorted(ROUTES), default='chat')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=2, help='requests per user')
+    parser.add_argument('--threads', type=int, default=8, help='worker threads for the sync app')
+    parser.add_argument('--plaid-latency', type=float, default=0.1)
+    parser.add_argument('--cohere-latency', type=float, default=1.0)
+    parser.add_argument('--port', type=int, default=5101)
+    parser.add_argument('--serve', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.threads, args.plaid_latency, args.cohere_latency)
+        return
+
+    print(f'{args.users} users x {args.requests} requests to {args.route}, '
+          f'plaid {args.plaid_latency}s, cohere {args.cohere_latency}s, sync threads {args.threads}')
+    print(f'{"mode":<6} {"req/s":>8} {"p50 s":>8} {"p99 s":>8} {"ttfb s":>8} {"errors":>7}')
+    for offset, mode in enumerate(['sync', 'async']):
+        port = args.port + offset
+        server = subprocess.Popen([
+            sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port),
+            '--threads', str(args.threads), '--plaid-latency', str(args.plaid_latency),
+            '--cohere-latency', str(args.cohere_latency)
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(port)
+            result = asyncio.run(drive(port, args.route, args.users, args.requests))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f'{mode:<6} {result["rps"]:>8.1f} {result["p50"]:>8.2f} {result["p99"]:>8.2f} '
+              f'{result["ttfb"]:>8.2f} {result["errors"]:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+A local stand-in for a Redis server, speaking enough of the RESP protocol
+for the redis state backend (strings, hashes, lists, expiry and
+MULTI/EXEC), so STATE_BACKEND=redis can be exercised offline.
+
+Usage (from backend/):
+    python benchmarks/fake_redis.py --port 6390
+    STATE_BACKEND=redis REDIS_URL=redis://localhost:6390/0 python app.py
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class Database:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def _get(self, key, default=None):
+        if key in self.expires and self.expires[key] < time.monotonic():
+            self.data.pop(key, None)
+            del self.expires[key]
+        return self.data.get(key, default)
+
+    def execute(self, command, args):
+        with self.lock:
+            return self._execute(command, args)
+
+    def execute_all(self, commands):
+        # MULTI/EXEC blocks run without other clients interleaving
+        with self.lock:
+            return [self._execute(command[0], command[1:]) for command in commands]
+
+    def _execute(self, command, args):
+        handler = getattr(self, 'cmd_' + command.lower(), None)
+        if handler is None:
+            return Error(f"ERR unknown command '{command}'")
+        return handler(*args)
+
+    def cmd_ping(self, *args):
+        return Status('PONG')
+
+    def cmd_client(self, *args):
+        return Status('OK')
+
+    def cmd_select(self, index):
+        return Status('OK')
+
+    def cmd_flushall(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return Status('OK')
+
+    def cmd_get(self, key):
+        return self._get(key)
+
+    def cmd_set(self, key, value, *options):
+        options = [o.upper() for o in options]
+        if 'NX' in options and self._get(key) is not None:
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if 'PX' in options:
+            self.expires[key] = time.monotonic() + int(options[options.index('PX') + 1]) / 1000
+        if 'EX' in options:
+            self.expires[key] = time.monotonic() + int(options[options.index('EX') + 1])
+        return Status('OK')
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._get(key) is not None:
+                del self.data[key]
+                self.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_expire(self, key, seconds):
+        if self._get(key) is None:
+            return 0
+        self.expires[key] = time.monotonic() + int(seconds)
+        return 1
+
+    def cmd_hset(self, key, *pairs):
+        hash_ = self._get(key)
+        if hash_ is None:
+            hash_ = self.data[key] = {}
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in hash_
+            hash_[field] = value
+        return added
+
+    def cmd_hgetall(self, key):
+        hash_ = self._get(key, {})
+        return [item for pair in hash_.items() for item in pair]
+
+    def cmd_rpush(self, key, *values):
+        if self._get(key) is None:
+            self.data[key] = []
+        self.data[key].extend(values)
+        return len(self.data[key])
+
+    def cmd_lrange(self, key, start, stop):
+        items = self._get(key, [])
+        start, stop = int(start), int(stop)
+        if start < 0:
+            start = max(len(items) + start, 0)
+        stop = len(items) + stop if stop < 0 else stop
+        return items[start:stop + 1]
+
+    def cmd_ltrim(self, key, start, stop):
+        items = self._get(key)
+        if items is not None:
+            self.data[key] = self.cmd_lrange(key, start, stop)
+        return Status('OK')
+
+
+class Status(str):
+    pass
+
+
+class Error(str):
+    pass
+
+
+def encode(value):
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, Error):
+        return b'-' + value.encode() + b'\r\n'
+    if isinstance(value, Status):
+        return b'+' + value.encode() + b'\r\n'
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(encode(v) for v in value)
+    data = value if isinstance(value, bytes) else str(value).encode()
+    return b'$%d\r\n' % len(data) + data + b'\r\n'
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.decode().split()
+        parts = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            parts.append(self.rfile.read(length + 2)[:-2].decode())
+        return parts
+
+    def handle(self):
+        queued = None
+        while True:
+            command = self.read_command()
+            if not command:
+                return
+            name, args = command[0].upper(), command[1:]
+            if name == 'MULTI':
+                queued = []
+                reply = Status('OK')
+            elif name == 'EXEC':
+                reply = self.server.db.execute_all(queued or [])
+                queued = None
+            elif name == 'DISCARD':
+                queued = None
+                reply = Status('OK')
+            elif queued is not None:
+                queued.append(command)
+                reply = Status('QUEUED')
+            else:
+                reply = self.server.db.execute(name, args)
+            self.wfile.write(encode(reply))
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=6390):
+        super().__init__(('127.0.0.1', port), Handler)
+        self.db = Database()
+
+    def start(self):
+        """
+        Serve from a background thread, returning the server's URL
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return f'redis://127.0.0.1:{self.server_address[1]}/0'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+    FakeRedisServer(args.port).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
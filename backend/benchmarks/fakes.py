@@ -0,0 +1,228 @@
+"""
+Offline stand-ins for the Plaid and Cohere SDK clients with configurable
+latency, so the backend can be benchmarked without network access.
+Call install() before importing any backend module.
+"""
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+CATEGORIES = [
+    'TRANSPORTATION', 'TRAVEL', 'FOOD_AND_DRINK', 'GENERAL_MERCHANDISE',
+    'HOME_IMPROVEMENT', 'RENT_AND_UTILITIES', 'GENERAL_SERVICES',
+    'ENTERTAINMENT', 'INCOME', 'TRANSFER_OUT'
+]
+
+MERCHANTS = ['Uber', 'Lyft', 'Shell', 'Starbucks', 'Whole Foods', 'Amazon', 'Delta', 'Home Depot', None]
+
+# A few Plaid detailed categories per primary category
+DETAILED_CATEGORIES = {
+    'TRANSPORTATION': ['GAS', 'PUBLIC_TRANSIT', 'TAXIS_AND_RIDE_SHARES', 'OTHER_TRANSPORTATION'],
+    'TRAVEL': ['FLIGHTS', 'LODGING', 'RENTAL_CARS'],
+    'FOOD_AND_DRINK': ['GROCERIES', 'RESTAURANT', 'COFFEE', 'FAST_FOOD'],
+    'GENERAL_MERCHANDISE': ['CLOTHING_AND_ACCESSORIES', 'ELECTRONICS', 'ONLINE_MARKETPLACES'],
+    'HOME_IMPROVEMENT': ['FURNITURE', 'HARDWARE'],
+    'RENT_AND_UTILITIES': ['GAS_AND_ELECTRICITY', 'RENT', 'INTERNET_AND_CABLE'],
+    'GENERAL_SERVICES': ['AUTOMOTIVE', 'INSURANCE', 'POSTAGE_AND_SHIPPING'],
+    'ENTERTAINMENT': ['TV_AND_MOVIES', 'MUSIC_AND_AUDIO'],
+    'INCOME': ['WAGES'],
+    'TRANSFER_OUT': ['SAVINGS']
+}
+
+
+class Record:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __getitem__(self, key):
+        return self.__dict__[key]
+
+    def __contains__(self, key):
+        return key in self.__dict__
+
+    def get(self, key, default=None):
+        return self.__dict__.get(key, default)
+
+
+def synthetic_transactions(count, days=365, seed=0):
+    """
+    `count` transactions spread evenly over the last `days` days
+    """
+    rng = random.Random(seed)
+    today = datetime.now().date()
+    transactions = []
+    for i in range(count):
+        category = rng.choice(CATEGORIES)
+        merchant = rng.choice(MERCHANTS)
+        amount = round(rng.uniform(1, 400), 2)
+        detailed = f'{category}_{rng.choice(DETAILED_CATEGORIES[category])}'
+        transactions.append(Record(
+            transaction_id=f'txn-{seed}-{i}',
+            account_id='acc-checking',
+            amount=amount if category == 'INCOME' else -amount,
+            date=today - timedelta(days=i * days // max(count, 1)),
+            name=f'{merchant or "Store"} #{i % 97}',
+            merchant_name=merchant,
+            pending=False,
+            personal_finance_category=Record(primary=category, detailed=detailed)
+        ))
+    return transactions
+
+
+class FakePlaidApi:
+    """
+    Serves `transactions` for every access token, unless a token has been
+    given its own dataset with add_dataset(). Set `failing` to simulate
+    an outage.
+    """
+
+    def __init__(self, api_client=None, transactions=None, latency=0.05):
+        self.transactions = transactions if transactions is not None else synthetic_transactions(200)
+        self.latency = latency
+        self.datasets = {}
+        self._windows = {}
+        # Set to simulate an outage: every call fails after its latency
+        self.failing = False
+
+    def add_dataset(self, access_token, transactions):
+        self.datasets[access_token] = transactions
+
+    def _wait(self):
+        time.sleep(self.latency)
+        if self.failing:
+            raise ConnectionError('fake Plaid outage')
+
+    def _transactions(self, request):
+        return self.datasets.get(request['access_token'], self.transactions)
+
+    def _window(self, request):
+        # Paged requests repeat the same window, so filter it once
+        key = (request['access_token'], request['start_date'], request['end_date'])
+        if key not in self._windows:
+            self._windows[key] = [
+                t for t in self._transactions(request)
+                if request['start_date'] <= t.date <= request['end_date']
+            ]
+        return self._windows[key]
+
+    def link_token_create(self, request, **kwargs):
+        self._wait()
+        return Record(link_token='link-sandbox-fake', expiration=datetime.now().isoformat())
+
+    def item_public_token_exchange(self, request, **kwargs):
+        self._wait()
+        token = request['public_token']
+        return Record(access_token=f'access-{token}', item_id=f'item-{token}')
+
+    def accounts_get(self, request, **kwargs):
+        self._wait()
+        # Account ids are unique per item, as in Plaid
+        token = request['access_token']
+        return Record(accounts=[
+            Record(account_id=f'{token}-checking', balances=Record(current=2500.0)),
+            Record(account_id=f'{token}-savings', balances=Record(current=10400.0)),
+        ])
+
+    def transactions_sync(self, request, **kwargs):
+        self._wait()
+        start = int(request['cursor']) if 'cursor' in request and request['cursor'] else 0
+        count = request['count'] if 'count' in request else 100
+        transactions = self._transactions(request)
+        page = transactions[start:start + count]
+        cursor = start + len(page)
+        return Record(added=page, modified=[], removed=[], next_cursor=str(cursor),
+                      has_more=cursor < len(transactions))
+
+    def transactions_get(self, request, **kwargs):
+        self._wait()
+        options = request['options'] if 'options' in request else {}
+        offset = options['offset'] if 'offset' in options else 0
+        count = options['count'] if 'count' in options else 100
+        matching = self._window(request)
+        return Record(transactions=matching[offset:offset + count], total_transactions=len(matching), accounts=[])
+
+
+RECOMMENDATIONS = (
+    '[{"title": "Take transit", "description": "Ride the bus twice a week.", '
+    '"savingsAmount": "Save $40/month", "carbonReduction": "Reduce CO2 by 10%", '
+    '"category": "Transportation"}]'
+)
+
+
+CHAT_REPLY = (
+    'Hi! Based on your recent spending.\n\n'
+    '• Ride transit twice a week to cut fuel costs and emissions.\n\n'
+    '• Buy fewer new gadgets and repair the ones you have.\n\n'
+    'Would you like more specific advice?'
+)
+
+
+def _reply_for(message):
+    return RECOMMENDATIONS if 'JSON' in (message or '') else CHAT_REPLY
+
+
+class FakeCohereClient:
+    """
+    Non-streaming calls sleep for `latency`; streaming calls spread the
+    same latency evenly across the reply's tokens.
+    """
+    latency = 1.0
+
+    def __init__(self, api_key=None, max_retries=3, timeout=120, **kwargs):
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+    def chat(self, message=None, stream=False, **kwargs):
+        if stream:
+            return self._stream(_reply_for(message))
+        time.sleep(self.latency)
+        return Record(text=_reply_for(message))
+
+    def _stream(self, text):
+        tokens = text.split(' ')
+        for token in tokens:
+            time.sleep(self.latency / len(tokens))
+            yield Record(event_type='text-generation', text=token + ' ')
+        yield Record(event_type='stream-end', finish_reason='COMPLETE')
+
+
+class FakeAsyncCohereClient:
+    latency = 1.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def chat(self, message=None, stream=False, **kwargs):
+        if stream:
+            return self._stream(_reply_for(message))
+        await asyncio.sleep(self.latency)
+        return Record(text=_reply_for(message))
+
+    async def _stream(self, text):
+        tokens = text.split(' ')
+        for token in tokens:
+            await asyncio.sleep(self.latency / len(tokens))
+            yield Record(event_type='text-generation', text=token + ' ')
+        yield Record(event_type='stream-end', finish_reason='COMPLETE')
+
+
+def install(plaid_latency=0.05, cohere_latency=1.0, transactions=None):
+    """
+    Patch the SDK entry points the backend modules use at import time
+    """
+    import cohere
+    from plaid.api import plaid_api
+
+    os.environ.setdefault('CO_API_KEY', 'fake')
+    os.environ.setdefault('COHERE_API_KEY', 'fake')
+
+    fake_plaid = FakePlaidApi(transactions=transactions, latency=plaid_latency)
+    plaid_api.PlaidApi = lambda api_client=None: fake_plaid
+    FakeCohereClient.latency = cohere_latency
+    FakeAsyncCohereClient.latency = cohere_latency
+    cohere.Client = FakeCohereClient
+    cohere.AsyncClient = FakeAsyncCohereClient
+    return fake_plaid
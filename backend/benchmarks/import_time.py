@@ -0,0 +1,73 @@
+"""
+Cold-start cost of the backend: how long a fresh process takes to import
+the app, which heavy SDKs that import pulled in, and what each shared
+client costs the first time it is used. Runs with Plaid and Cohere
+credentials removed from the environment (a backend/.env file still
+applies), so it also checks that a worker boots without them.
+
+Usage (from backend/):
+    python benchmarks/import_time.py --runs 5 --module app
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['plaid.api.plaid_api', 'cohere', 'numpy', 'flask']
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter() - started
+loaded = [name for name in {heavy!r} if name in sys.modules]
+
+import clients
+first_use = {{}}
+for name in ('plaid_client', 'cohere_client'):
+    started = time.perf_counter()
+    try:
+        getattr(clients, name)()
+        first_use[name] = time.perf_counter() - started
+    except Exception as e:
+        first_use[name] = type(e).__name__
+print(json.dumps({{'import': imported, 'loaded': loaded, 'first_use': first_use}}))
+'''
+
+
+def probe(module):
+    env = {k: v for k, v in os.environ.items()
+           if k not in ('PLAID_CLIENT_ID', 'PLAID_SECRET', 'CO_API_KEY', 'COHERE_API_KEY')}
+    env.update(
+        BACKGROUND_REFRESH='0',
+        GREENWEALTH_DB_PATH=os.path.join(tempfile.mkdtemp(), 'import.db')
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--module', default='app', help='module a worker imports at boot (app or asgi)')
+    args = parser.parse_args()
+
+    results = [probe(args.module) for _ in range(args.runs)]
+    imports = [result['import'] for result in results]
+    print(f'import {args.module}: median {statistics.median(imports):.3f}s, '
+          f'min {min(imports):.3f}s, max {max(imports):.3f}s over {args.runs} runs')
+    print(f'heavy modules loaded at import: {", ".join(results[0]["loaded"]) or "none"}')
+    for name, cost in results[0]['first_use'].items():
+        print(f'first {name}(): ' + (f'{cost:.3f}s' if isinstance(cost, float) else f'raised {cost}'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Per-endpoint latency and throughput of the backend against fake Plaid
+and Cohere clients, for clients holding from 10 to 100k transactions.
+Runs in-process with no network access, so results can be compared
+between commits in regression runs.
+
+Each client size gets its own linked client. For every endpoint the
+suite times one cold request first and then `--requests` requests from
+`--concurrency` threads. Chat messages differ per request, so every chat
+call reaches the fake Cohere client rather than the response cache. Use
+--cache-ttl 0 to recompute transaction aggregates on every request.
+
+Usage (from backend/):
+    python benchmarks/suite.py --sizes 10,1000,100000 --json results.json
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fakes
+
+ENDPOINTS = {
+    'transactions': ('GET', '/api/transactions?client_id={client}', None),
+    'carbon_footprint': ('GET', '/api/carbon_footprint?client_id={client}', None),
+    'financial_overview': ('GET', '/api/financial_overview?client_id={client}', None),
+    'account_summary': ('GET', '/api/account_summary?client_id={client}', None),
+    'dashboard': ('GET', '/api/dashboard?client_id={client}', None),
+    'ai-insights': ('GET', '/api/ai-insights?client_id={client}', None),
+    'chat': ('POST', '/api/chat', {'message': 'How can I cut my emissions? ({n})', 'user_id': '{client}'}),
+    'chat-stream': ('POST', '/api/chat/stream', {'message': 'What should I change first? ({n})', 'user_id': '{client}'}),
+}
+
+DEFAULT_SIZES = '10,100,1000,10000,100000'
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def fill(template, client, n):
+    if isinstance(template, dict):
+        return {key: fill(value, client, n) for key, value in template.items()}
+    return template.format(client=client, n=n)
+
+
+def run_endpoint(test_client, endpoint, client, requests, concurrency):
+    method, path, body = ENDPOINTS[endpoint]
+    counter = itertools.count()
+
+    def call():
+        n = next(counter)
+        started = time.perf_counter()
+        response = test_client.open(
+            fill(path, client, n), method=method,
+            json=fill(body, client, n) if body else None
+        )
+        # Drain streamed bodies so the whole response is timed
+        response.get_data()
+        return time.perf_counter() - started, response.status_code >= 400
+
+    cold, _ = call()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: call(), range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'endpoint': endpoint,
+        'cold': cold,
+        'requests': len(results),
+        'errors': sum(1 for _, failed in results if failed),
+        'rps': len(results) / elapsed,
+        'p50': percentile(latencies, 0.5),
+        'p99': percentile(latencies, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='comma-separated transactions per client')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='comma-separated endpoints')
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--days', type=int, default=365, help='days of history per client')
+    parser.add_argument('--plaid-latency', type=float, default=0.05)
+    parser.add_argument('--cohere-latency', type=float, default=0.5)
+    parser.add_argument('--cache-ttl', type=int, help='transaction cache TTL in seconds')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    endpoints = args.endpoints.split(',')
+    for endpoint in endpoints:
+        if endpoint not in ENDPOINTS:
+            parser.error(f'unknown endpoint {endpoint}; choose from {", ".join(ENDPOINTS)}')
+
+    # Configure the backend before it is imported
+    os.environ['GREENWEALTH_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['BACKGROUND_REFRESH'] = '0'
+    # One synthetic client sends every request; measure the LLM pool, not its rate limit
+    os.environ.setdefault('LLM_BURST', '1000000')
+    if args.cache_ttl is not None:
+        os.environ['TRANSACTION_CACHE_TTL'] = str(args.cache_ttl)
+    fake_plaid = fakes.install(plaid_latency=args.plaid_latency, cohere_latency=args.cohere_latency)
+    os.chdir(BACKEND_DIR)
+
+    # Keep the backend's debug output out of the report
+    quiet = contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with quiet:
+        import app
+
+    test_client = app.app.test_client()
+    results = []
+    print(f'plaid {args.plaid_latency}s, cohere {args.cohere_latency}s, '
+          f'{args.requests} requests x {args.concurrency} threads per endpoint')
+    print(f'{"transactions":>12} {"endpoint":<20} {"cold s":>8} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+
+    for size in sizes:
+        client = f'bench-{size}'
+        access_token = f'access-{client}'
+        fake_plaid.add_dataset(access_token, fakes.synthetic_transactions(size, days=args.days))
+        app.store.save_item(client, f'item-{client}', access_token)
+
+        for endpoint in endpoints:
+            with quiet:
+                result = run_endpoint(test_client, endpoint, client, args.requests, args.concurrency)
+            result['transactions'] = size
+            results.append(result)
+            print(f'{size:>12} {endpoint:<20} {result["cold"]:>8.2f} {result["rps"]:>8.1f} '
+                  f'{result["p50"] * 1000:>8.1f} {result["p99"] * 1000:>8.1f} {result["errors"]:>7}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'plaid_latency': args.plaid_latency,
+                'cohere_latency': args.cohere_latency,
+                'concurrency': args.concurrency,
+                'results': results
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
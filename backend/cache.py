@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+    Keys are tuples whose first element is the client id, so every entry
+    for a client can be dropped at once with `invalidate(client_id)`.
+    Concurrent misses on one key share a single load. With `stale_ttl`
+    set, an expired value is kept that much longer and served when
+    reloading it fails, e.g. while an upstream is down.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, stale_ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_served = 0
+        self.load_count = 0
+        self.load_seconds = 0.0
+        self._flight = SingleFlight()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                if expires_at + self.stale_ttl < time.monotonic():
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for `key`, calling `loader()` on a miss.
+        Callers that miss while a load for the same key is in flight wait
+        for it instead of loading again. Loader time is recorded so stats()
+        can estimate the upstream latency saved by hits.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        try:
+            return self._flight.do(key, lambda: self._load(key, loader, recheck=True))
+        except Exception:
+            value = self._stale(key)
+            if value is None:
+                raise
+            logger.warning("Serving stale cache entry after a failed load", exc_info=True)
+            return value
+
+    def reload(self, key, loader):
+        """
+        Load `key` even if it is cached, joining a load already in flight
+        """
+        return self._flight.do(key, lambda: self._load(key, loader))
+
+    def _stale(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] + self.stale_ttl < time.monotonic():
+                return None
+            self.stale_served += 1
+            return entry[1]
+
+    def _load(self, key, loader, recheck=False):
+        # A load that finished just before we joined may have filled the entry
+        if recheck:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] >= time.monotonic():
+                    return entry[1]
+
+        started = time.monotonic()
+        value = loader()
+        elapsed = time.monotonic() - started
+        with self._lock:
+            self.load_count += 1
+            self.load_seconds += elapsed
+        self.set(key, value)
+        return value
+
+    def invalidate(self, client_id):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == client_id]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_load = self.load_seconds / self.load_count if self.load_count else 0.0
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'avg_upstream_seconds': round(avg_load, 3),
+                'upstream_seconds_saved': round(self.hits * avg_load, 3),
+                'coalesced': self._flight.coalesced,
+                'stale_served': self.stale_served
+            }
@@ -0,0 +1,226 @@
+import functools
+import json
+import os
+import re
+import sys
+from types import MappingProxyType
+import numpy as np
+
+# Emission factors by detailed category and merchant, loaded once at startup
+EMISSION_FACTORS_PATH = os.getenv(
+    'EMISSION_FACTORS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'emission_factors.json')
+)
+
+# Find them from API doc
+CATEGORY_IMPACTS = {
+    # using GHG Protocol coefficient for estimation for transportation
+    'TRANSPORTATION': {'impact': 'high', 'factor': 1.853},
+    # using U.S. Government (EPA) coefficient fo estimation for travel
+    'TRAVEL': {'impact': 'high', 'factor': 1.278},
+    # using  U.S. Government (EPA) coefficient calc for estimation for food
+    'FOOD_AND_DRINK': {'impact': 'medium', 'factor': 0.255},
+    # using U.S. Government (EPA) coefficient for estimation for general merchandise
+    'GENERAL_MERCHANDISE': {'impact': 'medium', 'factor': 0.194},
+    # using U.S. Government (EPA) coefficient fo estimation for home improvement
+    'HOME_IMPROVEMENT': {'impact': 'medium', 'factor': 0.2678},
+    # using U.S. Government (EPA) coefficient fo estimation for rent and utilities
+    'RENT_AND_UTILITIES': {'impact': 'medium', 'factor': 0.1211},
+    # using U.S. Government (EPA) coefficient fo estimation for general services
+    'GENERAL_SERVICES': {'impact': 'low', 'factor': 0.1417},
+}
+
+DEFAULT_IMPACT = {'impact': 'low', 'factor': 0.05}
+
+# Impact labels follow the factor that scored each transaction, in kg
+# CO2e per USD: fuel, flights and electricity are high, rent and services low
+MEDIUM_IMPACT_FACTOR = 0.15
+HIGH_IMPACT_FACTOR = 1.0
+IMPACT_LEVELS = np.array(['low', 'medium', 'high'], dtype=object)
+
+# Money movements that do not emit anything themselves
+NON_EMITTING_CATEGORIES = frozenset(['INCOME', 'LOAN_PAYMENTS', 'TRANSFER_IN', 'TRANSFER_OUT'])
+
+
+def map_category_to_carbon_impact(category):
+    return CATEGORY_IMPACTS.get(category, DEFAULT_IMPACT)
+
+
+_PROCESSOR_PREFIX = re.compile(r'^(sq|tst|sp|pp|paypal)\s*\*\s*')
+_STORE_NUMBER = re.compile(r'[#*]\s*\d+|\b\d{3,}\b')
+_NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+_LEGAL_WORDS = frozenset(['the', 'inc', 'llc', 'ltd', 'co', 'corp', 'com'])
+
+
+@functools.lru_cache(maxsize=int(os.getenv('MERCHANT_CACHE_SIZE', 65536)))
+def normalize_merchant(name):
+    """
+    Canonical merchant name for factor lookups: lowercase words with no
+    punctuation, store numbers, card processor prefixes or legal
+    suffixes, so 'SQ *Blue Bottle #123' and 'Blue Bottle, Inc.' match.
+    """
+    if not name:
+        return ''
+    name = name.lower().replace("'", '').replace('&', ' and ')
+    name = _STORE_NUMBER.sub(' ', _PROCESSOR_PREFIX.sub('', name))
+    words = [word for word in _NON_ALPHANUMERIC.split(name) if word and word not in _LEGAL_WORDS]
+    return sys.intern(' '.join(words))
+
+
+class EmissionFactors:
+    """
+    Emission factors compiled into read-only maps with interned keys. A
+    merchant match takes precedence over the detailed category, which
+    takes precedence over the primary category.
+    """
+
+    def __init__(self, detailed, merchants, primary=CATEGORY_IMPACTS, default=DEFAULT_IMPACT['factor']):
+        self.detailed = MappingProxyType({sys.intern(k): float(v) for k, v in detailed.items()})
+        self.merchants = MappingProxyType({normalize_merchant(k): float(v) for k, v in merchants.items()})
+        self.primary = MappingProxyType({sys.intern(k): float(v['factor']) for k, v in primary.items()})
+        self.default = float(default)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data.get('detailed', {}), data.get('merchants', {}))
+
+    def merchant_factor(self, merchant, prefix=True):
+        """
+        Factor for a merchant name, or None. An exact (normalized) match
+        always counts; with `prefix`, so does the longest leading run of
+        words with a factor, so 'Uber Trip 123' matches 'uber'.
+        """
+        name = normalize_merchant(merchant)
+        factor = self.merchants.get(name)
+        if factor is not None or not prefix:
+            return factor
+        words = name.split(' ')
+        for end in range(len(words) - 1, 0, -1):
+            factor = self.merchants.get(' '.join(words[:end]))
+            if factor is not None:
+                return factor
+        return None
+
+    def factor(self, category, detailed_category=None, merchant=None):
+        # A prefix only stands in for a merchant when Plaid gave no detailed
+        # category; otherwise 'Delta Dental' would be priced as a flight
+        factor = self.merchant_factor(merchant, prefix=detailed_category is None) if merchant else None
+        if factor is None and detailed_category:
+            factor = self.detailed.get(detailed_category)
+        if factor is None:
+            factor = self.primary.get(category, self.default)
+        return factor
+
+    def factors(self, categories, detailed_categories, merchants):
+        """
+        Factor per transaction for parallel sequences of primary
+        categories, detailed categories and merchant names (None where
+        unknown). Each column is coded to integers, the distinct
+        combinations are resolved once, and the transactions gather their
+        factor from that table.
+        """
+        category_values, category_codes = _encode(categories)
+        detailed_values, detailed_codes = _encode(detailed_categories)
+        merchant_values, merchant_codes = _encode(merchants)
+        detailed_count, merchant_count = len(detailed_values), len(merchant_values)
+
+        combined = (category_codes * detailed_count + detailed_codes) * merchant_count + merchant_codes
+        keys, rows = np.unique(combined, return_inverse=True)
+        table = np.array([
+            self.factor(
+                category_values[key // (detailed_count * merchant_count)],
+                detailed_values[key // merchant_count % detailed_count],
+                merchant_values[key % merchant_count]
+            )
+            for key in keys.tolist()
+        ], dtype=np.float64)
+        return table[rows.reshape(-1)]
+
+
+def _encode(values):
+    # Distinct values in first-seen order, and each value's index into them
+    distinct = list(dict.fromkeys(values))
+    index = dict(zip(distinct, range(len(distinct))))
+    return distinct, np.fromiter(map(index.__getitem__, values), dtype=np.int64, count=len(values))
+
+
+EMISSION_FACTORS = EmissionFactors.load(EMISSION_FACTORS_PATH)
+
+
+def impact_levels(factors):
+    """
+    'low', 'medium' or 'high' for each emission factor
+    """
+    thresholds = np.array([MEDIUM_IMPACT_FACTOR, HIGH_IMPACT_FACTOR])
+    return IMPACT_LEVELS[np.searchsorted(thresholds, factors, side='right')]
+
+
+def score(amounts, factors):
+    """
+    Carbon in kg for a batch of amounts and their emission factors,
+    rounded per transaction like the original per-item calculation.
+    """
+    return np.round(np.abs(np.asarray(amounts, dtype=np.float64)) * factors, 1)
+
+
+class TransactionFrame:
+    """
+    Columnar view of a list of transactions. Amounts, dates and category
+    codes live in NumPy arrays so a whole batch is scored in one pass and
+    per-category totals come from grouped reductions.
+    """
+
+    def __init__(self, transactions, amounts, dates, codes, categories, factors=None):
+        self.transactions = transactions
+        self.amounts = amounts
+        self.dates = dates
+        self.codes = codes
+        self.categories = categories
+
+        self.category_factors = np.array(
+            [map_category_to_carbon_impact(c)['factor'] for c in categories], dtype=np.float64
+        )
+        if factors is None:
+            factors = self.category_factors[codes]
+        self.factors = factors
+        self.carbon = score(amounts, factors)
+
+    @classmethod
+    def from_transactions(cls, transactions):
+        rows = np.empty(len(transactions), dtype=object)
+        rows[:] = transactions
+        amounts = np.fromiter((t.amount for t in transactions), dtype=np.float64, count=len(transactions))
+        dates = np.array([t.date for t in transactions], dtype='datetime64[D]')
+        names = np.array([t.category for t in transactions], dtype=object)
+        categories, codes = np.unique(names, return_inverse=True)
+        factors = EMISSION_FACTORS.factors(
+            names,
+            [t.detailed_category for t in transactions],
+            [t.merchant_name for t in transactions]
+        )
+        return cls(rows, amounts, dates, codes.reshape(-1), tuple(categories), factors)
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def select(self, mask):
+        frame = TransactionFrame.__new__(TransactionFrame)
+        frame.transactions = self.transactions[mask]
+        frame.amounts = self.amounts[mask]
+        frame.dates = self.dates[mask]
+        frame.codes = self.codes[mask]
+        frame.factors = self.factors[mask]
+        frame.carbon = self.carbon[mask]
+        frame.categories = self.categories
+        frame.category_factors = self.category_factors
+        return frame
+
+    def since(self, start_date):
+        return self.select(self.dates >= np.datetime64(start_date, 'D'))
+
+    @property
+    def impacts(self):
+        return impact_levels(self.factors)
+
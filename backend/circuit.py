@@ -0,0 +1,151 @@
+import functools
+import inspect
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling an upstream whose circuit is open
+    """
+
+
+def is_upstream_failure(error):
+    """
+    Whether an error means the upstream is degraded: server errors, rate
+    limiting, or no response at all (timeouts and connection errors).
+    Errors about the request itself, such as a bad access token, do not
+    count.
+    """
+    status = getattr(error, 'status', None)
+    if status is None:
+        status = getattr(error, 'http_status', None)
+    if isinstance(status, int):
+        # Plaid reports a request that got no response as status 0
+        return status == 0 or status >= 500 or status == 429
+
+    # No response: timeouts and connection errors from the HTTP layer
+    return isinstance(error, OSError) or any(
+        cls.__module__.split('.')[0] in ('urllib3', 'aiohttp') or cls.__name__ == 'CohereConnectionError'
+        for cls in type(error).__mro__
+    )
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after `failure_threshold` consecutive
+    failures, failing fast for `reset_timeout` seconds. Then one trial
+    call is let through: success closes the circuit again, failure
+    reopens it.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, is_failure=is_upstream_failure):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    def before_call(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_running = False
+
+            if self.state == CLOSED:
+                return
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} is unavailable; retry in a few seconds")
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def record_error(self, error):
+        if not self.is_failure(error):
+            # The upstream answered; only this request was bad
+            self.record_success()
+            return
+
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.opened += 1
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def call(self, fn, *args, **kwargs):
+        self.before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record_error(e)
+            raise
+        self.record_success()
+        return result
+
+    async def call_async(self, fn, *args, **kwargs):
+        self.before_call()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            self.record_error(e)
+            raise
+        self.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected
+            }
+
+
+class GuardedClient:
+    """
+    Wraps an SDK client so every public method call goes through
+    `breaker`, with `call_defaults` (e.g. timeouts) added to its keyword
+    arguments unless the caller passes them.
+    """
+
+    def __init__(self, client, breaker, call_defaults=None):
+        self._client = client
+        self._breaker = breaker
+        self._call_defaults = call_defaults or {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        if inspect.iscoroutinefunction(attr):
+            @functools.wraps(attr)
+            async def guarded_async(*args, **kwargs):
+                return await self._breaker.call_async(attr, *args, **dict(self._call_defaults, **kwargs))
+            return guarded_async
+
+        @functools.wraps(attr)
+        def guarded(*args, **kwargs):
+            return self._breaker.call(attr, *args, **dict(self._call_defaults, **kwargs))
+        return guarded
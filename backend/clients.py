@@ -0,0 +1,179 @@
+"""
+The Plaid and Cohere clients every module shares, one of each per
+process. Each is created, and its SDK imported, the first time it is
+used, so workers boot without paying for clients they may never call and
+a missing key fails only the requests that need that service.
+"""
+import os
+import threading
+from dotenv import load_dotenv
+from circuit import CircuitBreaker, GuardedClient
+import metrics
+
+load_dotenv()
+
+# Keep-alive connections per upstream; size to the threads that call it
+# concurrently (UPSTREAM_WORKERS, ASGI_PLAID_WORKERS, server threads)
+PLAID_POOL_SIZE = int(os.getenv('PLAID_POOL_SIZE', 64))
+COHERE_POOL_SIZE = int(os.getenv('COHERE_POOL_SIZE', 64))
+
+# Per-call deadlines in seconds. Plaid takes (connect, read) timeouts.
+PLAID_CONNECT_TIMEOUT = float(os.getenv('PLAID_CONNECT_TIMEOUT', 3))
+PLAID_READ_TIMEOUT = float(os.getenv('PLAID_READ_TIMEOUT', 20))
+COHERE_TIMEOUT = int(os.getenv('COHERE_TIMEOUT', 30))
+COHERE_MAX_RETRIES = int(os.getenv('COHERE_MAX_RETRIES', 1))
+
+# Fail fast after this many consecutive upstream failures, for this long
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 30))
+
+breakers = {
+    service: CircuitBreaker(service, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+    for service in ('plaid', 'cohere')
+}
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _shared(name, create):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = create()
+    return client
+
+
+def _cohere_api_key():
+    api_key = os.getenv("CO_API_KEY") or os.getenv("COHERE_API_KEY")
+    if not api_key:
+        raise ValueError("CO_API_KEY not found in environment variables")
+    return api_key
+
+
+def _create_plaid_client():
+    import plaid
+    from plaid.api import plaid_api
+
+    configuration = plaid.Configuration(
+        host=plaid.Environment.Sandbox,
+        api_key={
+            'clientId': os.getenv('PLAID_CLIENT_ID'),
+            'secret': os.getenv('PLAID_SECRET'),
+        }
+    )
+    configuration.connection_pool_maxsize = PLAID_POOL_SIZE
+    client = GuardedClient(
+        plaid_api.PlaidApi(plaid.ApiClient(configuration)),
+        breakers['plaid'],
+        call_defaults={'_request_timeout': (PLAID_CONNECT_TIMEOUT, PLAID_READ_TIMEOUT)}
+    )
+    return metrics.instrument(client, 'plaid')
+
+
+def _create_cohere_client():
+    import cohere
+
+    client = _pooled_cohere_class(cohere.Client)(
+        api_key=_cohere_api_key(),
+        check_api_key=False,
+        max_retries=COHERE_MAX_RETRIES,
+        timeout=COHERE_TIMEOUT,
+        pool_size=COHERE_POOL_SIZE
+    )
+    return metrics.instrument(GuardedClient(client, breakers['cohere']), 'cohere')
+
+
+def _pooled_cohere_class(base):
+    """
+    The sync Cohere client opens a new requests.Session, and so a new TLS
+    connection, for every call, and sets no timeout on streamed calls.
+    This subclass sends every call through one keep-alive session.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    import cohere
+    from cohere.error import CohereAPIError, CohereConnectionError, CohereError
+
+    class PooledCohereClient(base):
+        def __init__(self, *args, pool_size=COHERE_POOL_SIZE, **kwargs):
+            super().__init__(*args, **kwargs)
+            retries = Retry(
+                total=self.max_retries,
+                backoff_factor=0.5,
+                allowed_methods=["POST", "GET"],
+                status_forcelist=cohere.RETRY_STATUS_CODES,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)
+            self._session = requests.Session()
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+        def _request(self, endpoint, json=None, files=None, method="POST", stream=False, params=None):
+            headers = {
+                "Authorization": "BEARER {}".format(self.api_key),
+                "Request-Source": self.request_source,
+            }
+            if json:
+                headers["Content-Type"] = "application/json"
+
+            url = f"{self.api_url}/{self.api_version}/{endpoint}"
+            try:
+                response = self._session.request(
+                    method, url, headers=headers, json=json, files=files, params=params,
+                    timeout=self.timeout, stream=stream, **self.request_dict
+                )
+            except requests.exceptions.ConnectionError as e:
+                raise CohereConnectionError(str(e)) from e
+            except requests.exceptions.RequestException as e:
+                raise CohereError(f"Unexpected exception ({e.__class__.__name__}): {e}") from e
+            if stream:
+                return response
+
+            try:
+                json_response = response.json()
+            except ValueError:
+                raise CohereAPIError.from_response(response, message=f"Failed to decode json body: {response.text}")
+
+            self._check_response(json_response, response.headers, response.status_code)
+            return json_response
+
+    return PooledCohereClient
+
+
+def _create_async_cohere_client():
+    import cohere
+
+    # The async client already reuses one aiohttp session; num_workers caps its connections
+    client = cohere.AsyncClient(
+        api_key=_cohere_api_key(),
+        check_api_key=False,
+        num_workers=COHERE_POOL_SIZE,
+        max_retries=COHERE_MAX_RETRIES,
+        timeout=COHERE_TIMEOUT
+    )
+    return metrics.instrument(GuardedClient(client, breakers['cohere']), 'cohere')
+
+
+def plaid_client():
+    return _shared('plaid', _create_plaid_client)
+
+
+def cohere_client():
+    return _shared('cohere', _create_cohere_client)
+
+
+def async_cohere_client():
+    """
+    Async Cohere client for the ASGI app. Call it from the event loop that
+    will use it, since its connection pool binds to that loop.
+    """
+    return _shared('cohere_async', _create_async_cohere_client)
+
+
+def circuit_stats():
+    return {service: breaker.stats() for service, breaker in breakers.items()}
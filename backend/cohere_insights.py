@@ -1,52 +1,28 @@
-import requests
-import cohere
-import os
 import json
 import logging
-from dotenv import load_dotenv
+from admission import AdmissionError, async_llm_gate, llm_pool, llm_rate_limiter
+from circuit import CircuitOpenError
+from clients import async_cohere_client, cohere_client
+from llm_cache import cache_key, response_cache
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+INSIGHTS_MODEL = "command"
 
-# Initialize Cohere client
-cohere_api_key = os.getenv("COHERE_API_KEY")
+# Bump when build_prompt changes so cached recommendations are not reused
+INSIGHTS_PROMPT_VERSION = 1
 
-# Add error checking for API key
-if not cohere_api_key:
-    raise ValueError("COHERE_API_KEY not found in environment variables")
-
-cohere_client = cohere.Client(api_key=cohere_api_key)
-
-def fetch_data():
+def fetch_data(client_id, provider):
     """
-    Fetch data from the API endpoints
+    Fetch the client's financial overview and account summary from an
+    in-process provider
     """
     try:
-        base_url = 'http://localhost:5000/api'
-        
-        # Fetch data from all endpoints
-        endpoints = {
-            'financial_overview': f'{base_url}/financial_overview',
-            'account_summary': f'{base_url}/account_summary'
-        }
-        
-        data = {}
-        for key, url in endpoints.items():
-            try:
-                response = requests.get(url)
-                response.raise_for_status()
-                data[key] = response.json()
-            except requests.exceptions.RequestException as e:
-                logging.error(f"Error fetching {key}: {e}")
-                data[key] = {}
-        
-        return data
-
+        return provider(client_id)
+    except (AdmissionError, CircuitOpenError):
+        raise
     except Exception as e:
-        logging.error(f"Error in fetch_data: {e}")
+        logger.error(f"Error in fetch_data: {e}")
         return None
 
 def format_data(data):
@@ -59,15 +35,8 @@ def format_data(data):
     """
     return formatted_data
 
-def get_recommendations(formatted_data):
-    """
-    Get recommendations from Cohere LLM
-    """
-    if not formatted_data:
-        logging.error("No data to process")
-        return None
-
-    prompt = f"""
+def build_prompt(formatted_data):
+    return f"""
     Based on the following user account data, provide three personalized recommendations to help the user to save money wisely, reduce carbon emissions, and adopt eco-friendly practices.
     Do not add any other information to the response other than requested.
     Each recommendation should be 1-2 sentences long and should attempt to provide feedback in one of these categories:  
@@ -95,33 +64,99 @@ def get_recommendations(formatted_data):
     
     Please ensure your response is in valid JSON format.
     """
-    
+
+def parse_recommendations(response):
+    """
+    Parse the JSON recommendations out of a Cohere chat response
+    """
+    # Access the text directly from the response
+    if hasattr(response, 'text'):
+        try:
+            return json.loads(response.text)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse response as JSON: {e}")
+            logger.debug(f"Raw content: {response.text}")
+            return None
+    else:
+        # Try accessing the response as a dictionary
+        try:
+            text = response.text if hasattr(response, 'text') else response.get('text', '')
+            return json.loads(text)
+        except (AttributeError, json.JSONDecodeError) as e:
+            logger.error(f"Failed to parse response: {e}")
+            logger.debug(f"Full response object: {response}")
+            return None
+
+def get_recommendations(formatted_data):
+    """
+    Get recommendations from Cohere LLM
+    """
+    if not formatted_data:
+        logger.error("No data to process")
+        return None
+
     try:
-        response = cohere_client.chat(
-            message=prompt,
-            model="command",
+        response = llm_pool.call(lambda: cohere_client().chat(
+            message=build_prompt(formatted_data),
+            model=INSIGHTS_MODEL,
             temperature=0.7
-        )
-        
-        # Access the text directly from the response
-        if hasattr(response, 'text'):
-            try:
-                return json.loads(response.text)
-            except json.JSONDecodeError as e:
-                logging.error(f"Failed to parse response as JSON: {e}")
-                logging.info(f"Raw content: {response.text}")
-                return None
-        else:
-            # Try accessing the response as a dictionary
-            try:
-                text = response.text if hasattr(response, 'text') else response.get('text', '')
-                return json.loads(text)
-            except (AttributeError, json.JSONDecodeError) as e:
-                logging.error(f"Failed to parse response: {e}")
-                logging.info(f"Full response object: {response}")
-                return None
+        ))
+        return parse_recommendations(response)
             
+    except (AdmissionError, CircuitOpenError):
+        raise
     except Exception as e:
-        logging.error(f"Error calling Cohere API: {e}")
-        logging.info(f"Full response object: {response}")
-        return None
\ No newline at end of file
+        logger.error(f"Error calling Cohere API: {e}")
+        return None
+
+async def get_recommendations_async(formatted_data):
+    """
+    Get recommendations from Cohere LLM without blocking the event loop
+    """
+    if not formatted_data:
+        logger.error("No data to process")
+        return None
+
+    try:
+        response = await async_llm_gate.call(lambda: async_cohere_client().chat(
+            message=build_prompt(formatted_data),
+            model=INSIGHTS_MODEL,
+            temperature=0.7
+        ))
+        return parse_recommendations(response)
+            
+    except (AdmissionError, CircuitOpenError):
+        raise
+    except Exception as e:
+        logger.error(f"Error calling Cohere API: {e}")
+        return None
+
+def recommendations_cache_key(data):
+    return cache_key(INSIGHTS_MODEL, INSIGHTS_PROMPT_VERSION, data)
+
+def get_cached_recommendations(data, client_id='default'):
+    """
+    Recommendations for the fetched data, served from the LLM cache
+    while the data is unchanged. Only a cache miss, which calls Cohere,
+    counts against the client's rate limit.
+    """
+    if not data:
+        logger.error("No data to process")
+        return None
+
+    def compute():
+        llm_rate_limiter.check(client_id)
+        return get_recommendations(format_data(data))
+
+    return response_cache.get_or_compute(recommendations_cache_key(data), compute)
+
+async def get_cached_recommendations_async(data, client_id='default'):
+    if not data:
+        logger.error("No data to process")
+        return None
+
+    async def compute():
+        llm_rate_limiter.check(client_id)
+        return await get_recommendations_async(format_data(data))
+
+    return await response_cache.get_or_compute_async(recommendations_cache_key(data), compute)
@@ -0,0 +1,58 @@
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent as is; compressing them saves little
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+COMPRESSIBLE_TYPES = frozenset(['application/json', 'text/csv', 'text/plain', 'text/html'])
+
+
+def choose_encoding(accept_encodings):
+    """
+    The encoding to answer with for a request's parsed Accept-Encoding:
+    brotli when both sides support it, then gzip, else None
+    """
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response, accept_encodings):
+    """
+    Compress a buffered response body in place when it is large enough
+    and the client accepts brotli or gzip. Streamed responses (SSE, exports)
+    are left alone. A strong ETag gets the encoding appended, since the
+    compressed bytes are a different representation.
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    data = response.get_data()
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None or len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
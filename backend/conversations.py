@@ -0,0 +1,165 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+
+
+class ConversationStore:
+    """
+    Chat history per user. Each user keeps a ring buffer of their last
+    `max_messages` messages; idle users are evicted least-recently-used
+    once `max_users` or `max_bytes` of message text is exceeded. With
+    `path` set, messages are also written to SQLite, so evicted users and
+    restarts lose nothing.
+    """
+
+    def __init__(self, max_messages=20, max_users=10000, max_bytes=64 * 1024 * 1024, path=None):
+        self.max_messages = max_messages
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self._users = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS messages ('
+                'user_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, '
+                'content TEXT NOT NULL, PRIMARY KEY (user_id, seq))'
+            )
+            self._db.commit()
+
+    def get(self, user_id):
+        """
+        The user's messages, oldest first, as a list of role/content dicts
+        """
+        with self._lock:
+            buffer = self._load(user_id)
+            return [{"role": role, "content": content} for _, role, content in buffer]
+
+    def add_exchange(self, user_id, message, response):
+        """
+        Append a user message and the assistant's reply, returning the
+        updated history
+        """
+        with self._lock:
+            buffer = self._load(user_id)
+            seq = buffer[-1][0] if buffer else 0
+            rows = [(seq + 1, "user", message), (seq + 2, "assistant", response)]
+
+            for row in rows:
+                if len(buffer) == self.max_messages:
+                    self._bytes -= _size(buffer.popleft())
+                buffer.append(row)
+                self._bytes += _size(row)
+
+            if self._db is not None:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO messages (user_id, seq, role, content) VALUES (?, ?, ?, ?)',
+                    [(user_id,) + row for row in rows]
+                )
+                self._db.execute(
+                    'DELETE FROM messages WHERE user_id = ? AND seq <= ?',
+                    (user_id, rows[-1][0] - self.max_messages)
+                )
+                self._db.commit()
+
+            self._evict(keep=user_id)
+            return [{"role": role, "content": content} for _, role, content in buffer]
+
+    def clear(self, user_id):
+        with self._lock:
+            buffer = self._users.pop(user_id, None)
+            if buffer:
+                self._bytes -= sum(_size(row) for row in buffer)
+            if self._db is not None:
+                self._db.execute('DELETE FROM messages WHERE user_id = ?', (user_id,))
+                self._db.commit()
+
+    def _load(self, user_id):
+        buffer = self._users.get(user_id)
+        if buffer is not None:
+            self._users.move_to_end(user_id)
+            return buffer
+
+        buffer = deque(maxlen=self.max_messages)
+        if self._db is not None:
+            rows = self._db.execute(
+                'SELECT seq, role, content FROM messages WHERE user_id = ? ORDER BY seq DESC LIMIT ?',
+                (user_id, self.max_messages)
+            ).fetchall()
+            for row in reversed(rows):
+                buffer.append(row)
+                self._bytes += _size(row)
+
+        self._users[user_id] = buffer
+        self._evict(keep=user_id)
+        return buffer
+
+    def _evict(self, keep):
+        while len(self._users) > 1 and (len(self._users) > self.max_users or self._bytes > self.max_bytes):
+            user_id, buffer = next(iter(self._users.items()))
+            if user_id == keep:
+                break
+            del self._users[user_id]
+            self._bytes -= sum(_size(row) for row in buffer)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'users': len(self._users),
+                'max_users': self.max_users,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'persistent': self._db is not None
+            }
+
+
+class RedisConversationStore:
+    """
+    Chat history per user in Redis, shared by every worker and host. Each
+    user's messages are a list trimmed to the last `max_messages`, which
+    expires after `ttl` seconds without activity.
+    """
+
+    def __init__(self, redis_client, max_messages=20, ttl=30 * 24 * 3600, prefix='greenwealth'):
+        self.redis = redis_client
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, user_id):
+        return f'{self.prefix}:chat:{user_id}'
+
+    def get(self, user_id):
+        return [json.loads(entry) for entry in self.redis.lrange(self._key(user_id), 0, -1)]
+
+    def add_exchange(self, user_id, message, response):
+        key = self._key(user_id)
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.rpush(key,
+                   json.dumps({"role": "user", "content": message}),
+                   json.dumps({"role": "assistant", "content": response}))
+        pipe.ltrim(key, -self.max_messages, -1)
+        pipe.expire(key, self.ttl)
+        pipe.lrange(key, 0, -1)
+        return [json.loads(entry) for entry in pipe.execute()[-1]]
+
+    def clear(self, user_id):
+        self.redis.delete(self._key(user_id))
+
+    def stats(self):
+        return {
+            'max_messages': self.max_messages,
+            'ttl': self.ttl,
+            'persistent': True
+        }
+
+
+def _size(row):
+    return len(row[2]) + len(row[1])
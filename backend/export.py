@@ -0,0 +1,66 @@
+import csv
+import io
+import json
+from carbon import TransactionFrame
+
+EXPORT_FIELDS = (
+    'id', 'date', 'name', 'merchant', 'amount', 'category', 'detailed_category', 'carbon_kg', 'impact'
+)
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def scored_rows(batches):
+    """
+    Export rows with carbon scores for each batch of stored transactions.
+    Every batch is scored as its own TransactionFrame, so only one batch
+    is held in memory at a time.
+    """
+    for batch in batches:
+        frame = TransactionFrame.from_transactions(batch)
+        yield [
+            {
+                'id': transaction.transaction_id,
+                'date': transaction.date.isoformat(),
+                'name': transaction.name,
+                'merchant': transaction.merchant_name,
+                'amount': transaction.amount,
+                'category': transaction.category,
+                'detailed_category': transaction.detailed_category,
+                'carbon_kg': float(carbon),
+                'impact': impact
+            }
+            for transaction, carbon, impact in zip(batch, frame.carbon, frame.impacts)
+        ]
+
+
+def ndjson_chunks(row_batches):
+    for rows in row_batches:
+        yield ''.join(json.dumps(row) + '\n' for row in rows)
+
+
+def csv_chunks(row_batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for rows in row_batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only, for an empty export
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_chunks(batches, export_format):
+    """
+    The text of an export, one chunk per batch of transactions
+    """
+    rows = scored_rows(batches)
+    if export_format == 'csv':
+        return csv_chunks(rows)
+    return ndjson_chunks(rows)
@@ -0,0 +1,30 @@
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5001')
+
+# One process per core plus one; each serves requests on a thread pool
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1))
+worker_class = os.getenv('WORKER_CLASS', 'gthread')
+# admission.py reads WORKER_THREADS too: LLM calls may hold all but
+# LLM_RESERVED_THREADS of these, so the rest stay free for the dashboard
+threads = int(os.getenv('WORKER_THREADS', 16))
+
+# Chat replies can take tens of seconds to stream
+timeout = int(os.getenv('WORKER_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = 10000
+max_requests_jitter = 1000
+
+accesslog = '-'
+
+
+def on_starting(server):
+    if workers > 1 and os.getenv('STATE_BACKEND', 'memory') != 'redis':
+        server.log.warning(
+            'Running %d workers with STATE_BACKEND=memory: chat history is not '
+            'shared between them. Set STATE_BACKEND=redis and REDIS_URL.', workers
+        )
@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import plaid
+from plaid.model.transactions_sync_request import TransactionsSyncRequest
+from plaid.model.transactions_sync_request_options import TransactionsSyncRequestOptions
+from transaction_pages import iter_transaction_pages
+
+# Largest page /transactions/sync allows
+SYNC_PAGE_SIZE = 500
+
+# Restarts of a sync whose item changed mid-pagination, and the pause
+# before each (doubled every attempt), before the error is raised
+SYNC_MUTATION_RETRIES = int(os.getenv('SYNC_MUTATION_RETRIES', 3))
+SYNC_MUTATION_BACKOFF = float(os.getenv('SYNC_MUTATION_BACKOFF', 0.5))
+
+# History an initial sync is trusted to cover (Plaid's default days_requested)
+SYNC_HISTORY_DAYS = int(os.getenv('SYNC_HISTORY_DAYS', 90))
+
+
+class Ledger:
+    """
+    One Plaid item's transactions in the SQLite store, kept current with
+    /transactions/sync. Only the delta since the stored cursor is
+    downloaded on each refresh, and the cursor survives restarts. Windows
+    reaching further back than the sync history are backfilled once with
+    paginated transactions_get.
+    """
+
+    def __init__(self, store, client_id, item_id, access_token, cursor=None, history_start=None):
+        self.store = store
+        self.client_id = client_id
+        self.item_id = item_id
+        self.access_token = access_token
+        self.cursor = cursor
+        self.history_start = history_start
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def sync(self, plaid_client):
+        """
+        Pull every page of changes since the stored cursor and apply them.
+        Returns the number of added, modified and removed transactions.
+        """
+        with self._lock:
+            attempt = 0
+            while True:
+                try:
+                    added, modified, removed, cursor = self._fetch_delta(plaid_client)
+                    break
+                except plaid.ApiException as e:
+                    # Plaid asks callers to restart from the original cursor
+                    # when the item changes while we are paging
+                    if (_error_code(e) != 'TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION'
+                            or attempt >= SYNC_MUTATION_RETRIES):
+                        raise
+                    time.sleep(SYNC_MUTATION_BACKOFF * 2 ** attempt)
+                    attempt += 1
+
+            self.store.apply_sync(self.client_id, self.item_id, added, modified, removed, cursor)
+            self.cursor = cursor
+            if self.history_start is None:
+                self.history_start = datetime.now().date() - timedelta(days=SYNC_HISTORY_DAYS)
+                self.store.set_history_start(self.item_id, self.history_start)
+            changes = len(added) + len(modified) + len(removed)
+            if changes:
+                self.version += 1
+            return changes
+
+    def _fetch_delta(self, plaid_client):
+        added, modified, removed = [], [], []
+        cursor = self.cursor
+        has_more = True
+
+        while has_more:
+            sync_request = TransactionsSyncRequest(
+                access_token=self.access_token,
+                count=SYNC_PAGE_SIZE,
+                options=TransactionsSyncRequestOptions(
+                    include_personal_finance_category=True
+                )
+            )
+            if cursor:
+                sync_request.cursor = cursor
+
+            response = plaid_client.transactions_sync(sync_request)
+            added.extend(response['added'])
+            modified.extend(response['modified'])
+            removed.extend(response['removed'])
+            cursor = response['next_cursor']
+            has_more = response['has_more']
+
+        return added, modified, removed, cursor
+
+    def ensure_history(self, plaid_client, days):
+        """
+        Make sure the ledger holds the last `days` days, fetching the
+        missing older range concurrently and writing it to the store a
+        page at a time. Returns the number of transactions added.
+        """
+        start_date = datetime.now().date() - timedelta(days=days)
+        with self._lock:
+            if self.history_start is not None and start_date >= self.history_start:
+                return 0
+
+            end_date = self.history_start or datetime.now().date()
+            added = 0
+            for page in iter_transaction_pages(plaid_client, self.access_token, start_date, end_date):
+                # Synced copies are at least as fresh as the backfilled ones
+                added += self.store.add_transactions(self.client_id, self.item_id, page)
+
+            # Only a complete backfill moves the history start back
+            self.store.set_history_start(self.item_id, start_date)
+            self.history_start = start_date
+            if added:
+                self.version += 1
+            return added
+
+
+def _error_code(exception):
+    try:
+        return json.loads(exception.body).get('error_code')
+    except (TypeError, ValueError, AttributeError):
+        return None
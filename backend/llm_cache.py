@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from cache import TTLCache
+from singleflight import AsyncSingleFlight, SingleFlight
+
+load_dotenv()
+
+
+def cache_key(model, template_version, data):
+    """
+    Content address for one LLM call: a hash of the model, the prompt
+    template version and the input data in canonical form.
+    """
+    payload = json.dumps({
+        'model': model,
+        'template': template_version,
+        'input': normalize(data)
+    }, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def normalize(data):
+    # Whitespace and key order should not change the address
+    if isinstance(data, str):
+        return ' '.join(data.split())
+    if isinstance(data, dict):
+        return {str(k): normalize(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [normalize(v) for v in data]
+    if isinstance(data, float):
+        return round(data, 2)
+    return data
+
+
+class LLMCache:
+    """
+    LRU+TTL cache for LLM outputs, addressed by cache_key(). Values are
+    stored as JSON, so parsed responses (e.g. recommendation lists) can be
+    cached directly. With `path` set, entries are also written to a SQLite
+    file and survive restarts. Identical calls in flight at the same time
+    are made once.
+    """
+
+    def __init__(self, maxsize=1024, ttl=6 * 3600, path=None):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl
+        self.path = path
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._async_flight = AsyncSingleFlight()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._db.execute('DELETE FROM llm_cache WHERE expires_at < ?', (time.time(),))
+            self._db.commit()
+
+    def get(self, key):
+        value = self.memory.get(('llm', key))
+        if value is not None or self._db is None:
+            return value
+
+        with self._db_lock:
+            row = self._db.execute(
+                'SELECT value, expires_at FROM llm_cache WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+
+        value = json.loads(row[0])
+        self.memory.set(('llm', key), value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(('llm', key), value)
+        if self._db is None:
+            return
+
+        with self._db_lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time() + self.ttl)
+            )
+            self._db.commit()
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for `key`, or call `compute()` and cache
+        its result. Concurrent callers for the same key share one call.
+        Empty results (failed calls) are not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        return self._flight.do(key, lambda: self._compute(key, compute))
+
+    async def get_or_compute_async(self, key, compute):
+        """
+        get_or_compute for coroutine functions, coalesced on the event loop
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        async def compute_and_store():
+            value = await compute()
+            if value:
+                self.set(key, value)
+            return value
+
+        return await self._async_flight.do(key, compute_and_store)
+
+    def _compute(self, key, compute):
+        value = compute()
+        if value:
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats['persistent'] = self._db is not None
+        stats['coalesced'] = self._flight.coalesced + self._async_flight.coalesced
+        return stats
+
+
+response_cache = LLMCache(
+    maxsize=int(os.getenv('LLM_CACHE_SIZE', 1024)),
+    ttl=int(os.getenv('LLM_CACHE_TTL', 6 * 3600)),
+    path=os.getenv('LLM_CACHE_PATH')
+)
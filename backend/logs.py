@@ -0,0 +1,57 @@
+import json
+import logging
+import os
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_ATTRS = set(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+
+def _fields(record):
+    return {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, with extra= fields as top-level keys
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(_fields(record))
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Plain log lines with extra= fields appended as key=value pairs
+    """
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{k}={v}' for k, v in fields.items())
+        return line
+
+
+def configure_logging():
+    """
+    Route all loggers to stderr at LOG_LEVEL (default INFO), as text or,
+    with LOG_FORMAT=json, as JSON lines
+    """
+    handler = logging.StreamHandler()
+    if os.getenv('LOG_FORMAT', 'text') == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(TextFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
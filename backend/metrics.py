@@ -0,0 +1,242 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Metric:
+    """
+    A named metric with a fixed set of label names. Values are kept per
+    combination of label values, which callers pass as keyword arguments.
+    """
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self._labels(key), value) for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, then +Inf, sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, counts in self._values.items():
+                labels = self._labels(key)
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    samples.append((self.name + '_bucket', dict(labels, le=_format_value(bound)), cumulative))
+                samples.append((self.name + '_sum', labels, counts[-1]))
+                samples.append((self.name + '_count', labels, cumulative))
+        return samples
+
+
+class CallbackMetric(Metric):
+    """
+    A metric whose samples are read from `callback` at scrape time, for
+    values other components already track (cache and queue stats). The
+    callback returns (labels, value) pairs.
+    """
+
+    def __init__(self, name, documentation, type, callback):
+        super().__init__(name, documentation)
+        self.type = type
+        self.callback = callback
+
+    def samples(self):
+        return [(self.name, labels, value) for labels, value in self.callback()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, type, callback):
+        return self.register(CallbackMetric(name, documentation, type, callback))
+
+    def render(self):
+        """
+        Every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                if labels:
+                    label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                    lines.append(f'{name}{{{label_text}}} {_format_value(value)}')
+                else:
+                    lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    return '+Inf' if value == float('inf') else str(value)
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    'greenwealth_http_requests_total', 'HTTP requests served', ('route', 'method', 'status')
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    'greenwealth_http_request_duration_seconds', 'Time spent serving HTTP requests', ('route', 'method')
+)
+HTTP_IN_FLIGHT = registry.gauge(
+    'greenwealth_http_requests_in_flight', 'HTTP requests currently being served', ('route',)
+)
+UPSTREAM_REQUESTS = registry.counter(
+    'greenwealth_upstream_requests_total', 'Calls to Plaid and Cohere', ('service', 'operation', 'outcome')
+)
+UPSTREAM_DURATION = registry.histogram(
+    'greenwealth_upstream_duration_seconds', 'Time spent in Plaid and Cohere calls', ('service', 'operation')
+)
+UPSTREAM_IN_FLIGHT = registry.gauge(
+    'greenwealth_upstream_requests_in_flight', 'Plaid and Cohere calls currently waiting', ('service',)
+)
+
+
+def request_started(route):
+    """
+    Mark one HTTP request on `route` as in flight, returning its start time
+    for request_finished()
+    """
+    HTTP_IN_FLIGHT.inc(route=route)
+    return time.perf_counter()
+
+
+def request_finished(route, method, status, started):
+    HTTP_IN_FLIGHT.dec(route=route)
+    HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, route=route, method=method)
+    HTTP_REQUESTS.inc(route=route, method=method, status=status)
+
+
+@contextmanager
+def track_upstream(service, operation):
+    outcome = 'error'
+    started = time.perf_counter()
+    UPSTREAM_IN_FLIGHT.inc(service=service)
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        UPSTREAM_IN_FLIGHT.dec(service=service)
+        UPSTREAM_DURATION.observe(time.perf_counter() - started, service=service, operation=operation)
+        UPSTREAM_REQUESTS.inc(service=service, operation=operation, outcome=outcome)
+
+
+class InstrumentedClient:
+    """
+    Wraps an SDK client so every public method call is counted and timed
+    as an upstream request of `service`. Coroutine methods are awaited
+    inside the timer.
+    """
+
+    def __init__(self, client, service):
+        self._client = client
+        self._service = service
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        if inspect.iscoroutinefunction(attr):
+            @functools.wraps(attr)
+            async def timed_async(*args, **kwargs):
+                with track_upstream(self._service, name):
+                    return await attr(*args, **kwargs)
+            return timed_async
+
+        @functools.wraps(attr)
+        def timed(*args, **kwargs):
+            with track_upstream(self._service, name):
+                return attr(*args, **kwargs)
+        return timed
+
+
+def instrument(client, service):
+    return InstrumentedClient(client, service)
@@ -0,0 +1,103 @@
+import numpy as np
+
+
+class DailyRollup:
+    """
+    Daily totals of a TransactionFrame per category between start and end,
+    stored as cumulative sums. The total over any date range is the
+    difference of two rows, so period totals and period-over-period
+    comparisons cost the same however long the history is.
+    """
+
+    def __init__(self, frame, start, end):
+        self.start = np.datetime64(start, 'D')
+        self.end = np.datetime64(end, 'D')
+        self.categories = frame.categories
+        self.days = int((self.end - self.start).astype(np.int64)) + 1
+
+        in_range = (frame.dates >= self.start) & (frame.dates <= self.end)
+        day = (frame.dates[in_range] - self.start).astype(np.int64)
+        codes = frame.codes[in_range]
+        amounts = frame.amounts[in_range]
+        carbon = frame.carbon[in_range]
+        expenses = amounts < 0
+
+        # Per-day, per-category columns the rollup keeps running totals of
+        columns = {
+            'spending': np.where(expenses, -amounts, 0.0),
+            'income': np.where(expenses, 0.0, amounts),
+            'net': amounts,
+            'expense_carbon': np.where(expenses, carbon, 0.0),
+            'carbon': carbon,
+            'expense_count': expenses.astype(np.float64),
+            'count': np.ones(len(amounts))
+        }
+
+        # One cell per (day, category); row 0 is the empty prefix
+        width = len(self.categories)
+        cells = day * width + codes
+        self._sums = {}
+        for field, values in columns.items():
+            daily = np.bincount(cells, weights=values, minlength=self.days * width)
+            cumulative = np.zeros((self.days + 1, width))
+            np.cumsum(daily.reshape(self.days, width), axis=0, out=cumulative[1:])
+            self._sums[field] = cumulative
+
+    def _row(self, date):
+        # Index of the prefix row just before `date`, clamped to the rollup
+        offset = int((np.datetime64(date, 'D') - self.start).astype(np.int64))
+        return min(max(offset, 0), self.days)
+
+    def per_category(self, field, start, end):
+        """
+        Array of `field` totals per category code from start to end,
+        both inclusive
+        """
+        sums = self._sums[field]
+        first, stop = self._row(start), self._row(np.datetime64(end, 'D') + 1)
+        return sums[stop] - sums[first] if stop > first else sums[0]
+
+    def total(self, field, start, end):
+        return float(self.per_category(field, start, end).sum())
+
+    def by_category(self, field, start, end, count_field='count'):
+        """
+        `field` totals from start to end keyed by category name, for the
+        categories with at least one transaction counted by `count_field`
+        """
+        totals = self.per_category(field, start, end)
+        counts = self.per_category(count_field, start, end)
+        return {
+            self.categories[code]: float(totals[code])
+            for code in np.flatnonzero(counts > 0.5)
+        }
+
+    def month_starts(self):
+        """
+        First day of every calendar month overlapping the rollup. Months
+        are whole dates, so the same month of different years is never
+        merged.
+        """
+        months = np.arange(self.start.astype('datetime64[M]'), self.end.astype('datetime64[M]') + 1)
+        return months.astype('datetime64[D]')
+
+    def monthly(self, field):
+        """
+        (month start, total) pairs of `field` for every month in the
+        rollup, oldest first. Empty months are reported as 0.
+        """
+        starts = self.month_starts()
+        sums = self._sums[field].sum(axis=1)
+        rows = np.clip((starts - self.start).astype(np.int64), 0, self.days)
+        ends = np.append(rows[1:], self.days)
+        return [(start.astype(object), float(total)) for start, total in zip(starts, sums[ends] - sums[rows])]
+
+
+def percent_change(current, previous):
+    """
+    Change from `previous` to `current` in percent, or 0 when there is
+    nothing to compare against
+    """
+    if not previous:
+        return 0.0
+    return round((current - previous) / abs(previous) * 100, 1)
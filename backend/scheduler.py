@@ -0,0 +1,153 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """
+    Keeps linked clients' data warm in the background. A client is
+    refreshed right after linking and then every `interval` seconds (with
+    random jitter, so clients linked together do not refresh together)
+    for as long as it has been active within `active_window`. Failures back
+    off exponentially per client, up to `max_backoff` seconds.
+
+    When several processes schedule the same client, `claim(client_id,
+    ttl)` decides which one refreshes it: a round is skipped, and counted
+    as skipped, unless it returns True. The lease lasts just under the
+    shortest jittered interval, so the holder can claim its next round.
+    """
+
+    def __init__(self, refresh, interval=240, jitter=0.1, workers=4,
+                 active_window=3600, max_backoff=1800, claim=None):
+        self.refresh = refresh
+        self.claim = claim
+        self.interval = interval
+        self.jitter = jitter
+        self.active_window = active_window
+        self.max_backoff = max_backoff
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='refresh')
+        self._queue = []
+        self._due = {}
+        self._last_seen = {}
+        self._failures = {}
+        self._running = set()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.refreshes = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def schedule(self, client_id, delay=0):
+        """
+        Refresh `client_id` after `delay` seconds and keep it on the
+        periodic schedule
+        """
+        with self._condition:
+            self._last_seen[client_id] = time.monotonic()
+            self._push(client_id, delay)
+            self._start()
+
+    def touch(self, client_id):
+        """
+        Record user activity, putting the client back on the schedule if it
+        had gone idle
+        """
+        with self._condition:
+            self._last_seen[client_id] = time.monotonic()
+            if client_id not in self._due and client_id not in self._running:
+                self._push(client_id, self._next_delay(client_id))
+                self._start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._pool.shutdown(wait=False)
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='refresh-scheduler', daemon=True)
+            self._thread.start()
+
+    def _push(self, client_id, delay):
+        run_at = time.monotonic() + delay
+        if client_id in self._due and self._due[client_id] <= run_at:
+            return
+        self._due[client_id] = run_at
+        heapq.heappush(self._queue, (run_at, client_id))
+        self._condition.notify()
+
+    def _next_delay(self, client_id):
+        delay = self.interval * (2 ** self._failures.get(client_id, 0))
+        delay = min(delay, self.max_backoff)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._queue:
+                        run_at, client_id = self._queue[0]
+                        wait = run_at - time.monotonic()
+                        if wait <= 0:
+                            heapq.heappop(self._queue)
+                            break
+                        self._condition.wait(wait)
+                    else:
+                        self._condition.wait()
+                if self._stopped:
+                    return
+
+                # Skip entries superseded by an earlier reschedule
+                if self._due.get(client_id) != run_at:
+                    continue
+                del self._due[client_id]
+
+                idle = time.monotonic() - self._last_seen.get(client_id, 0)
+                if idle > self.active_window:
+                    self._failures.pop(client_id, None)
+                    continue
+                self._running.add(client_id)
+
+            self._pool.submit(self._refresh, client_id)
+
+    def _refresh(self, client_id):
+        skipped = failed = False
+        try:
+            if self.claim and not self.claim(client_id, self.interval * (1 - self.jitter) * 0.95):
+                skipped = True
+            else:
+                self.refresh(client_id)
+        except Exception as e:
+            logger.warning("Background refresh failed: %s", e, extra={'client_id': client_id})
+            failed = True
+
+        with self._condition:
+            self._running.discard(client_id)
+            if skipped:
+                self.skipped += 1
+            elif failed:
+                self.errors += 1
+                self._failures[client_id] = self._failures.get(client_id, 0) + 1
+            else:
+                self.refreshes += 1
+                self._failures.pop(client_id, None)
+            if not self._stopped:
+                self._push(client_id, self._next_delay(client_id))
+
+    def stats(self):
+        with self._condition:
+            return {
+                'scheduled': len(self._due),
+                'running': len(self._running),
+                'backing_off': len(self._failures),
+                'refreshes': self.refreshes,
+                'skipped': self.skipped,
+                'errors': self.errors
+            }
@@ -0,0 +1,128 @@
+"""
+Where state that every worker must agree on lives: which Plaid items each
+client has linked, and chat history. STATE_BACKEND picks the backend:
+
+- memory (default): links in this host's SQLite store and chat history
+  in an in-process ConversationStore. Suited to a single worker.
+- redis: links and chat history in Redis at REDIS_URL, so any worker on
+  any host can serve any user. Needs the redis package.
+
+Transactions always stay in each host's SQLite store, synced from Plaid
+on demand.
+
+Both backends keep the per-client background refresh lease in the host's
+SQLite store. Warming syncs into that store, so of the workers on one
+host only one refreshes a client each round, while every host still
+warms its own copy.
+"""
+import os
+import threading
+from collections import OrderedDict
+from conversations import ConversationStore, RedisConversationStore
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Links a worker remembers having mirrored into its store, most recent kept
+MIRROR_CACHE_SIZE = int(os.getenv('MIRROR_CACHE_SIZE', 10000))
+
+
+class MemoryState:
+    shared = False
+
+    def __init__(self, store, conversations):
+        self.store = store
+        self.conversations = conversations
+
+    def get_links(self, client_id):
+        """
+        The client's linked items as [(item_id, access_token)], oldest first
+        """
+        return [(item[0], item[1]) for item in self.store.get_items(client_id)]
+
+    def save_link(self, client_id, item_id, access_token):
+        self.store.save_item(client_id, item_id, access_token)
+        # The new item should be warmed now, not after the current lease
+        self.store.release_refresh(client_id)
+
+    def claim_refresh(self, client_id, ttl):
+        return self.store.claim_refresh(client_id, ttl)
+
+
+class RedisState:
+    """
+    Links are kept in a Redis hash per client, mapping item_id to access
+    token. A host registers each link it sees in its own SQLite store, so
+    its ledgers have an item to sync.
+    """
+    shared = True
+
+    def __init__(self, redis_client, store, conversations, prefix='greenwealth'):
+        self.redis = redis_client
+        self.store = store
+        self.conversations = conversations
+        self.prefix = prefix
+        self._mirrored = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, client_id):
+        return f'{self.prefix}:items:{client_id}'
+
+    def get_links(self, client_id):
+        links = self.redis.hgetall(self._key(client_id))
+        for item_id, access_token in links.items():
+            self._mirror(client_id, item_id, access_token)
+        return sorted(links.items())
+
+    def save_link(self, client_id, item_id, access_token):
+        self.redis.hset(self._key(client_id), item_id, access_token)
+        self._mirror(client_id, item_id, access_token)
+        self.store.release_refresh(client_id)
+
+    def claim_refresh(self, client_id, ttl):
+        # Per host, not in Redis: each host warms its own SQLite store
+        return self.store.claim_refresh(client_id, ttl)
+
+    def _mirror(self, client_id, item_id, access_token):
+        # Links made by other workers or hosts show up here first. Items
+        # forgotten here are simply mirrored again, which is idempotent.
+        with self._lock:
+            if self._mirrored.get(item_id) == access_token:
+                self._mirrored.move_to_end(item_id)
+                return
+            self.store.save_item(client_id, item_id, access_token)
+            self._mirrored[item_id] = access_token
+            if len(self._mirrored) > MIRROR_CACHE_SIZE:
+                self._mirrored.popitem(last=False)
+
+
+def default_state(store):
+    max_messages = int(os.getenv('CONVERSATION_MAX_MESSAGES', 20))
+    backend = os.getenv('STATE_BACKEND', 'memory')
+
+    if backend == 'redis':
+        if redis is None:
+            raise RuntimeError("STATE_BACKEND=redis requires the redis package: pip install redis")
+        redis_client = redis.Redis.from_url(
+            os.getenv('REDIS_URL', 'redis://localhost:6379/0'), decode_responses=True
+        )
+        conversations = RedisConversationStore(
+            redis_client,
+            max_messages=max_messages,
+            ttl=int(os.getenv('CONVERSATION_TTL', 30 * 24 * 3600))
+        )
+        return RedisState(redis_client, store, conversations)
+
+    if backend != 'memory':
+        raise ValueError(f"Unknown STATE_BACKEND {backend!r}; use 'memory' or 'redis'")
+
+    # Store conversation history: a bounded ring buffer per user, optionally in SQLite
+    conversations = ConversationStore(
+        max_messages=max_messages,
+        max_users=int(os.getenv('CONVERSATION_MAX_USERS', 10000)),
+        max_bytes=int(os.getenv('CONVERSATION_MAX_BYTES', 64 * 1024 * 1024)),
+        path=os.getenv('CONVERSATION_DB_PATH')
+    )
+    return MemoryState(store, conversations)
@@ -0,0 +1,260 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+# Normalized transaction row, the shape every route reads
+Transaction = namedtuple('Transaction', [
+    'transaction_id', 'account_id', 'date', 'amount', 'name',
+    'merchant_name', 'category', 'detailed_category'
+])
+
+UNCATEGORIZED = 'OTHER'
+
+# Rows per batch when streaming transactions out of the store
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    item_id TEXT PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    access_token TEXT NOT NULL,
+    cursor TEXT,
+    history_start TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_client ON items (client_id);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    account_id TEXT,
+    date TEXT NOT NULL,
+    amount REAL NOT NULL,
+    name TEXT,
+    merchant_name TEXT,
+    category TEXT NOT NULL,
+    detailed_category TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_client_date ON transactions (client_id, date);
+CREATE INDEX IF NOT EXISTS transactions_client_category ON transactions (client_id, category);
+CREATE INDEX IF NOT EXISTS transactions_item ON transactions (item_id);
+
+CREATE TABLE IF NOT EXISTS refresh_leases (
+    client_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+"""
+
+TRANSACTION_COLUMNS = 'transaction_id, account_id, date, amount, name, merchant_name, category, detailed_category'
+
+
+def normalize_transaction(transaction):
+    """
+    Flatten a Plaid transaction into the columns we store
+    """
+    category = transaction.personal_finance_category
+    return Transaction(
+        transaction_id=transaction.transaction_id,
+        account_id=transaction.account_id,
+        date=transaction.date,
+        amount=float(transaction.amount),
+        name=transaction.name,
+        merchant_name=transaction.merchant_name,
+        category=category.primary if category else UNCATEGORIZED,
+        detailed_category=category.detailed if category else None
+    )
+
+
+class Store:
+    """
+    Embedded SQLite store for linked items, their access tokens and sync
+    cursors, and normalized transactions. Runs in WAL mode with one
+    connection per thread, so readers never block the syncing writer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def save_item(self, client_id, item_id, access_token):
+        """
+        Link an item to a client alongside any items they already have.
+        Relinking an existing item only replaces its access token.
+        """
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    'INSERT INTO items (item_id, client_id, access_token, created_at) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT (item_id) DO UPDATE SET access_token = excluded.access_token',
+                    (item_id, client_id, access_token, time.time())
+                )
+
+    def get_items(self, client_id):
+        """
+        Every item the client has linked, oldest first, as
+        (item_id, access_token, cursor, history_start)
+        """
+        rows = self._conn().execute(
+            'SELECT item_id, access_token, cursor, history_start FROM items '
+            'WHERE client_id = ? ORDER BY created_at, item_id',
+            (client_id,)
+        ).fetchall()
+        return [
+            (row[0], row[1], row[2], date.fromisoformat(row[3]) if row[3] else None)
+            for row in rows
+        ]
+
+    def claim_refresh(self, client_id, ttl):
+        """
+        Take the client's background refresh lease for `ttl` seconds.
+        False if another process sharing this store holds it.
+        """
+        now = time.time()
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                cursor = conn.execute(
+                    'INSERT INTO refresh_leases (client_id, expires_at) VALUES (?, ?) '
+                    'ON CONFLICT (client_id) DO UPDATE SET expires_at = excluded.expires_at '
+                    'WHERE refresh_leases.expires_at <= ?',
+                    (client_id, now + ttl, now)
+                )
+        return cursor.rowcount == 1
+
+    def release_refresh(self, client_id):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute('DELETE FROM refresh_leases WHERE client_id = ?', (client_id,))
+
+    def apply_sync(self, client_id, item_id, added, modified, removed, cursor):
+        """
+        Apply one /transactions/sync delta and advance the cursor atomically
+        """
+        upserts = [normalize_transaction(t) for t in added + modified]
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.executemany(
+                    f'INSERT OR REPLACE INTO transactions (client_id, item_id, {TRANSACTION_COLUMNS}) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(client_id, item_id) + _row(t) for t in upserts]
+                )
+                conn.executemany(
+                    'DELETE FROM transactions WHERE transaction_id = ?',
+                    [(t.transaction_id,) for t in removed]
+                )
+                conn.execute('UPDATE items SET cursor = ? WHERE item_id = ?', (cursor, item_id))
+
+    def add_transactions(self, client_id, item_id, transactions):
+        """
+        Insert backfilled transactions that are not stored yet. Returns the
+        number of rows added.
+        """
+        rows = [(client_id, item_id) + _row(normalize_transaction(t)) for t in transactions]
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                before = conn.total_changes
+                conn.executemany(
+                    f'INSERT OR IGNORE INTO transactions (client_id, item_id, {TRANSACTION_COLUMNS}) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+                added = conn.total_changes - before
+        return added
+
+    def set_history_start(self, item_id, history_start):
+        with self._write_lock:
+            conn = self._conn()
+            with conn:
+                conn.execute(
+                    'UPDATE items SET history_start = ? WHERE item_id = ?',
+                    (history_start.isoformat(), item_id)
+                )
+
+    def query_transactions(self, client_id, start_date=None, end_date=None, category=None):
+        """
+        The client's transactions, newest first, filtered by an optional
+        date range and primary category. Served by the (client_id, date)
+        and (client_id, category) indexes.
+        """
+        sql, params = _transaction_query(client_id, start_date, end_date, category)
+        sql += ' ORDER BY date DESC, transaction_id'
+        return [_transaction(row) for row in self._conn().execute(sql, params)]
+
+    def iter_transactions(self, client_id, start_date=None, end_date=None, category=None,
+                          batch_size=EXPORT_BATCH_SIZE):
+        """
+        Like query_transactions, but yields lists of at most `batch_size`
+        transactions. Each batch is its own keyset query continuing after
+        the last row of the previous one, so no read transaction is held
+        open between batches and memory stays bounded by the batch size.
+        """
+        base_sql, base_params = _transaction_query(client_id, start_date, end_date, category)
+        after = None
+        while True:
+            sql, params = base_sql, list(base_params)
+            if after is not None:
+                sql += ' AND (date < ? OR (date = ? AND transaction_id > ?))'
+                params += [after[0], after[0], after[1]]
+            sql += ' ORDER BY date DESC, transaction_id LIMIT ?'
+            params.append(batch_size)
+
+            rows = self._conn().execute(sql, params).fetchall()
+            if not rows:
+                return
+            yield [_transaction(row) for row in rows]
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1][2], rows[-1][0])
+
+
+def _transaction_query(client_id, start_date, end_date, category):
+    sql = f'SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE client_id = ?'
+    params = [client_id]
+    if start_date is not None:
+        sql += ' AND date >= ?'
+        params.append(start_date.isoformat())
+    if end_date is not None:
+        sql += ' AND date <= ?'
+        params.append(end_date.isoformat())
+    if category is not None:
+        sql += ' AND category = ?'
+        params.append(category)
+    return sql, params
+
+
+def _transaction(row):
+    return Transaction(row[0], row[1], date.fromisoformat(row[2]), *row[3:])
+
+
+def _row(transaction):
+    return (
+        transaction.transaction_id, transaction.account_id, transaction.date.isoformat(),
+        transaction.amount, transaction.name, transaction.merchant_name,
+        transaction.category, transaction.detailed_category
+    )
+
+
+def default_store():
+    path = os.getenv('GREENWEALTH_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'greenwealth.db')
+    return Store(path)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from carbon import EMISSION_FACTORS, EmissionFactors, TransactionFrame, impact_levels
+
+
+@pytest.mark.parametrize('merchant, detailed, expected', [
+    # Businesses that merely share a first word with a priced merchant
+    ('Delta Dental', 'MEDICAL_DENTAL_CARE', 0.14),
+    ('Shell Beach Cafe', 'FOOD_AND_DRINK_RESTAURANT', 0.26),
+    ('Uber Eats', 'FOOD_AND_DRINK_FAST_FOOD', 0.31),
+    # Exact merchant matches still win over the category
+    ('Delta Air Lines', 'TRAVEL_FLIGHTS', 1.93),
+    ('Uber', 'TRANSPORTATION_TAXIS_AND_RIDE_SHARES', 0.58),
+    ('SQ *Starbucks #123', 'FOOD_AND_DRINK_COFFEE', 0.21),
+])
+def test_merchant_collisions_use_the_detailed_category(merchant, detailed, expected):
+    assert EMISSION_FACTORS.factor('OTHER', detailed, merchant) == expected
+
+
+def test_prefix_match_only_without_a_detailed_category():
+    assert EMISSION_FACTORS.factor('TRANSPORTATION', None, 'Uber Trip 4821') == 0.58
+    assert EMISSION_FACTORS.factor('FOOD_AND_DRINK', None, 'Uber Eats Order') == 0.31
+    assert EMISSION_FACTORS.factor('TRANSPORTATION', 'TRANSPORTATION_PUBLIC_TRANSIT', 'Uber Trip 4821') == 0.45
+
+
+def test_no_ambiguous_single_word_merchant_keys():
+    for key in ('delta', 'shell', 'bp', 'lime', 'mta', 'bart', 'mobil'):
+        assert key not in EMISSION_FACTORS.merchants
+
+
+def test_collisions_are_labelled_by_the_factor_that_scored_them():
+    factors = EMISSION_FACTORS.factors(
+        ['MEDICAL', 'FOOD_AND_DRINK', 'TRAVEL'],
+        ['MEDICAL_DENTAL_CARE', 'FOOD_AND_DRINK_RESTAURANT', 'TRAVEL_FLIGHTS'],
+        ['Delta Dental', 'Shell Beach Cafe', 'Delta Air Lines']
+    )
+    assert list(impact_levels(factors)) == ['low', 'medium', 'high']
+
+
+def test_batch_factors_match_per_transaction_factors():
+    factors = EmissionFactors({'A_X': 0.5}, {'acme': 2.0})
+    categories = ['TRAVEL', 'TRAVEL', 'A', 'A', 'UNKNOWN']
+    detailed = [None, 'A_X', 'A_X', None, None]
+    merchants = ['Acme Air', 'Acme Air', None, 'Acme', 'Acme']
+    expected = [factors.factor(*row) for row in zip(categories, detailed, merchants)]
+    assert factors.factors(categories, detailed, merchants).tolist() == expected
+    assert expected == [2.0, 0.5, 0.5, 2.0, 2.0]
+
+
+def test_frame_scores_with_the_batch_factors():
+    from storage import Transaction
+    from datetime import date
+    rows = [
+        Transaction('t1', 'a', date(2024, 1, 1), 100.0, 'Delta Dental', 'Delta Dental', 'MEDICAL', 'MEDICAL_DENTAL_CARE'),
+        Transaction('t2', 'a', date(2024, 1, 2), -50.0, 'Shell Oil 1234', 'Shell Oil', 'TRANSPORTATION', 'TRANSPORTATION_GAS'),
+    ]
+    frame = TransactionFrame.from_transactions(rows)
+    assert np.allclose(frame.carbon, [14.0, 120.0])
+    assert list(frame.impacts) == ['low', 'high']
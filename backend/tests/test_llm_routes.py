@@ -0,0 +1,93 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import pytest
+
+os.environ.update(GREENWEALTH_DB_PATH=tempfile.mktemp(suffix='.db'), BACKGROUND_REFRESH='0', LOG_LEVEL='CRITICAL')
+
+import fakes
+
+fakes.install(plaid_latency=0, cohere_latency=0)
+
+import app
+import asgi
+from clients import breakers
+
+
+@pytest.fixture
+def cohere_down():
+    breaker = breakers['cohere']
+    for _ in range(breaker.failure_threshold):
+        breaker.record_error(ConnectionError('cohere unreachable'))
+    yield
+    breaker.record_success()
+
+
+def asgi_request(method, path, body=None, query=''):
+    sent = []
+    payload = json.dumps(body).encode() if body is not None else b''
+
+    async def receive():
+        return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'raw_path': path.encode(),
+        'query_string': query.encode(), 'headers': [(b'content-type', b'application/json')],
+        'http_version': '1.1', 'scheme': 'http', 'server': ('test', 80), 'client': ('test', 1), 'root_path': ''
+    }
+    asyncio.run(asgi.app(scope, receive, send))
+    headers = dict(sent[0]['headers'])
+    return sent[0]['status'], headers, b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def test_chat_is_unavailable_while_cohere_circuit_is_open(cohere_down):
+    response = app.app.test_client().post('/api/chat', json={'message': 'hi', 'user_id': 'flask-chat'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    assert app.conversations.get('flask-chat') == []
+
+
+def test_chat_stream_reports_open_circuit_without_saving(cohere_down):
+    response = app.app.test_client().post('/api/chat/stream', json={'message': 'hi', 'user_id': 'flask-stream'})
+    body = response.get_data(as_text=True)
+
+    assert 'event: error' in body
+    assert 'event: done' not in body
+    assert app.conversations.get('flask-stream') == []
+
+
+def test_ai_insights_is_unavailable_while_cohere_circuit_is_open(cohere_down):
+    response = app.app.test_client().get('/api/ai-insights?client_id=flask-insights')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+
+
+def test_asgi_chat_is_unavailable_while_cohere_circuit_is_open(cohere_down):
+    status, headers, _ = asgi_request('POST', '/api/chat', {'message': 'hi', 'user_id': 'asgi-chat'})
+
+    assert status == 503
+    assert headers[b'retry-after']
+    assert app.conversations.get('asgi-chat') == []
+
+
+def test_asgi_chat_stream_reports_open_circuit_without_saving(cohere_down):
+    status, _, body = asgi_request('POST', '/api/chat/stream', {'message': 'hi', 'user_id': 'asgi-stream'})
+
+    assert status == 200
+    assert b'event: error' in body
+    assert b'event: done' not in body
+    assert app.conversations.get('asgi-stream') == []
+
+
+def test_asgi_ai_insights_is_unavailable_while_cohere_circuit_is_open(cohere_down):
+    status, headers, _ = asgi_request('GET', '/api/ai-insights', query='client_id=asgi-insights')
+
+    assert status == 503
+    assert headers[b'retry-after']
@@ -0,0 +1,49 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from plaid.model.transactions_get_request import TransactionsGetRequest
+from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
+
+# Largest page /transactions/get allows
+PAGE_SIZE = 500
+MAX_WORKERS = 4
+
+
+def iter_transaction_pages(plaid_client, access_token, start_date, end_date,
+                           page_size=PAGE_SIZE, max_workers=MAX_WORKERS):
+    """
+    Yield every page of transactions between start_date and end_date.
+    The first page tells us total_transactions; the remaining pages are
+    requested concurrently, at most `max_workers` ahead of the caller, so
+    only that many pages are held at once however long the range is.
+    Pages can overlap if transactions post while we are paging.
+    """
+    def fetch_page(offset):
+        plaid_request = TransactionsGetRequest(
+            access_token=access_token,
+            start_date=start_date,
+            end_date=end_date,
+            options=TransactionsGetRequestOptions(
+                count=page_size,
+                offset=offset,
+                include_personal_finance_category=True
+            )
+        )
+        return plaid_client.transactions_get(plaid_request)
+
+    first_page = fetch_page(0)
+    total = first_page['total_transactions']
+    yield first_page['transactions']
+    del first_page
+
+    offsets = list(range(page_size, total, page_size))
+    if not offsets:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(offsets))) as pool:
+        pending = deque()
+        for offset in offsets:
+            pending.append(pool.submit(fetch_page, offset))
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()['transactions']
+        while pending:
+            yield pending.popleft().result()['transactions']
@@ -0,0 +1,13 @@
+"""
+Production entry point for the Flask app:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The async app is served the same way with uvicorn workers:
+
+    WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+
+Run more than one worker or host with STATE_BACKEND=redis, so linked
+items and chat history are shared between them.
+"""
+from app import app
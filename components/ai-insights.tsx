@@ -3,6 +3,7 @@
 import { useEffect, useState } from "react"
 import { Car, Utensils, ShoppingBag, Home, Plane, Wrench, Briefcase, LightbulbIcon } from "lucide-react"
 import { Badge } from "@/components/ui/badge"
+import { usePlaid } from "@/lib/plaid-context"
 
 type Insight = {
   title: string
@@ -15,11 +16,12 @@ type Insight = {
 export function AiInsights() {
   const [insights, setInsights] = useState<Insight[]>([])
   const [isLoading, setIsLoading] = useState(true)
+  const { clientId } = usePlaid()
 
   useEffect(() => {
     const fetchRecommendations = async () => {
       try {
-        const response = await fetch('http://localhost:5000/api/ai-insights');
+        const response = await fetch(`http://localhost:5000/api/ai-insights?client_id=${clientId}`);
         if (!response.ok) {
           throw new Error('Failed to fetch recommendations');
         }
@@ -31,7 +33,7 @@ export function AiInsights() {
     };
 
     fetchRecommendations();
-  }, []);
+  }, [clientId]);
 
   const getCategoryIcon = (category: string) => {
     switch (category.toLowerCase()) {
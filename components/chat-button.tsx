@@ -37,10 +37,10 @@ export function ChatButton() {
     setMessages((prev) => [...prev, { role: "user", content: userMessage }])
 
     try {
-      const response = await fetch("http://localhost:5000/api/chat", {
+      const response = await fetch("http://localhost:5000/api/chat/stream", {
         method: "POST",
         headers: {
-          "Accept": "application/json",
+          "Accept": "text/event-stream",
           "Content-Type": "application/json",
         },
         body: JSON.stringify({
@@ -49,12 +49,61 @@ export function ChatButton() {
         }),
       })
 
-      if (!response.ok) {
+      if (response.status === 429 || response.status === 503) {
+        // Rate limited or shed before the stream started
+        const { error } = await response.json()
+        const retryAfter = response.headers.get("Retry-After")
+        setMessages((prev) => [
+          ...prev,
+          { role: "assistant", content: retryAfter ? `${error} (try again in ${retryAfter}s)` : error },
+        ])
+        return
+      }
+
+      if (!response.ok || !response.body) {
         throw new Error("Failed to get response")
       }
 
-      const data = await response.json()
-      setMessages(data.conversation_history)
+      // Show the reply as tokens arrive instead of waiting for the full completion
+      setMessages((prev) => [...prev, { role: "assistant", content: "" }])
+      setIsLoading(false)
+
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+
+        buffer += decoder.decode(value, { stream: true })
+        const events = buffer.split("\n\n")
+        buffer = events.pop() ?? ""
+
+        for (const event of events) {
+          const dataLine = event.split("\n").find((line) => line.startsWith("data: "))
+          if (!dataLine) continue
+          const data = JSON.parse(dataLine.slice("data: ".length))
+
+          if (event.startsWith("event: done")) {
+            setMessages(data.conversation_history)
+          } else if (event.startsWith("event: error")) {
+            // Refused or timed out by the server's LLM limits
+            const notice = data.retry_after
+              ? `${data.error} (try again in ${data.retry_after}s)`
+              : data.error
+            setMessages((prev) => {
+              const last = prev[prev.length - 1]
+              return [...prev.slice(0, -1), { ...last, content: last.content ? `${last.content}\n\n${notice}` : notice }]
+            })
+          } else {
+            setMessages((prev) => {
+              const last = prev[prev.length - 1]
+              return [...prev.slice(0, -1), { ...last, content: last.content + data.token }]
+            })
+          }
+        }
+      }
     } catch (error) {
       console.error("Error sending message:", error)
       setMessages((prev) => [
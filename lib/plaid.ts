@@ -56,64 +56,56 @@ export async function exchangePublicToken(publicToken: string, clientId: string)
   }
 }
 
-export async function fetchTransactions(clientId: string) {
-  try {
-    const response = await fetch(`http://localhost:5000/api/transactions?client_id=${clientId}`)
-
-    if (!response.ok) {
-      throw new Error("Failed to fetch transactions")
-    }
-
-    return await response.json()
-  } catch (error) {
-    console.error("Error fetching transactions:", error)
-    throw error
+// Dashboard sections come from one /api/dashboard response. Components that
+// mount together share the same in-flight request instead of each calling
+// their own endpoint.
+const DASHBOARD_TTL_MS = 5000
+const dashboardRequests = new Map<string, { promise: Promise<any>; fetchedAt: number }>()
+
+export async function fetchDashboard(clientId: string) {
+  const cached = dashboardRequests.get(clientId)
+  if (cached && Date.now() - cached.fetchedAt < DASHBOARD_TTL_MS) {
+    return cached.promise
   }
-}
 
-export async function fetchCarbonFootprint(clientId: string) {
-  try {
-    const response = await fetch(`http://localhost:5000/api/carbon_footprint?client_id=${clientId}`)
+  const promise = (async () => {
+    const response = await fetch(`http://localhost:5000/api/dashboard?client_id=${clientId}`)
 
     if (!response.ok) {
-      throw new Error("Failed to fetch carbon footprint data")
+      throw new Error("Failed to fetch dashboard data")
     }
 
     return await response.json()
+  })()
+  dashboardRequests.set(clientId, { promise, fetchedAt: Date.now() })
+
+  try {
+    return await promise
   } catch (error) {
-    console.error("Error fetching carbon footprint:", error)
+    dashboardRequests.delete(clientId)
+    console.error("Error fetching dashboard:", error)
     throw error
   }
 }
 
-export async function fetchFinancialOverview(clientId: string) {
-  try {
-    const response = await fetch(`http://localhost:5000/api/financial_overview?client_id=${clientId}`)
+export async function fetchTransactions(clientId: string) {
+  const dashboard = await fetchDashboard(clientId)
+  return dashboard.transactions
+}
 
-    if (!response.ok) {
-      throw new Error("Failed to fetch financial overview data")
-    }
+export async function fetchCarbonFootprint(clientId: string) {
+  const dashboard = await fetchDashboard(clientId)
+  return dashboard.carbon_footprint
+}
 
-    return await response.json()
-  } catch (error) {
-    console.error("Error fetching financial overview:", error)
-    throw error
-  }
+export async function fetchFinancialOverview(clientId: string) {
+  const dashboard = await fetchDashboard(clientId)
+  return dashboard.financial_overview
 }
 
 export async function fetchAccountSummary(clientId: string) {
-  try {
-    const response = await fetch(`http://localhost:5000/api/account_summary?client_id=${clientId}`)
-
-    if (!response.ok) {
-      throw new Error("Failed to fetch account summary data")
-    }
-
-    return await response.json()
-  } catch (error) {
-    console.error("Error fetching account summary:", error)
-    throw error
-  }
+  const dashboard = await fetchDashboard(clientId)
+  return dashboard.account_summary
 }
 
 export async function fetchInsights() {